@@ -162,7 +162,7 @@ class TradePilotAPI {
   }
 
   async searchPlansByTicker(ticker: string) {
-    return this.fetch<{ plans: PlanV2[]; ticker: string }>(`/api/v2/plans/search/${ticker}`);
+    return this.fetch<{ plans: PlanSearchResult[]; ticker: string }>(`/api/v2/plans/search/${ticker}`);
   }
 
   // ─── Settings ─────────────────────────────────────────────────────
@@ -379,8 +379,8 @@ export interface PlanV2 {
     fill_price: number;
     contracts: number;
     time: string;
-    auto_deviations: string[];
-    self_reported_deviations: string[];
+    auto_deviations?: string[];  // omitted when empty
+    self_reported_deviations?: string[];  // omitted when empty
     deviation_count: number;
   } | null;
 
@@ -423,9 +423,19 @@ export interface CreatePlanV2 {
   [key: string]: any;  // Allow additional card/deep-dive fields
 }
 
+// Deep-dive fields projected out of ticker search results (PLAN_SEARCH_EXCLUDE)
+type PlanSearchOmitted =
+  | "session_id" | "checklist_premarket" | "checklist_intraday" | "confidence_breakdown"
+  | "thesis" | "regime_context" | "invalidation" | "position_kill";
+
+export type PlanSearchResult = Omit<PlanV2, PlanSearchOmitted> & Partial<Pick<PlanV2, PlanSearchOmitted>>;
+
+// Slim per-plan summary pushed by the history aggregation (not the full plan)
+export type PlanHistorySummary = Pick<PlanV2, "_id" | "ticker" | "direction" | "status" | "total_pnl_dollars">;
+
 export interface PlanHistoryDay {
   date: string;
-  plans: PlanV2[];
+  plans: PlanHistorySummary[];
   total_pnl: number;
   entered_count: number;
   rules_broken: number;
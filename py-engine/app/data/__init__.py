@@ -1 +1 @@
-from .yahoo_fetcher import fetch_ticker_data
+from .yahoo_fetcher import fetch_ticker_data, fetch_ticker_data_many, fetch_many_tickers
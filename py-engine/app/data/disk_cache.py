@@ -0,0 +1,195 @@
+"""
+TradePilot Disk Cache
+Persists fetched market data as Arrow IPC / Parquet files (and slow-changing
+LLM output as text) so repeat fetches and restarts reload from disk instead of
+going back to the network.
+pyarrow is optional — without it every lookup is a miss and writes are skipped.
+"""
+
+import functools
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+CACHE_DIR = Path(os.getenv("TRADEPILOT_CACHE_DIR", "~/.tradepilot/cache")).expanduser()
+
+# Cache entries older than this are purged on write
+CACHE_MAX_AGE_DAYS = 30
+
+
+def cache_path(name: str) -> Path:
+    """Path for a cache entry; characters unsafe in filenames are replaced."""
+    return CACHE_DIR / re.sub(r"[^A-Za-z0-9._^=-]", "_", name)
+
+
+def is_fresh(path: Path, ttl_seconds: float) -> bool:
+    """True if the file exists and was written within the last ttl_seconds."""
+    try:
+        return time.time() - path.stat().st_mtime < ttl_seconds
+    except OSError:
+        return False
+
+
+def read_arrays(path: Path, ttl_seconds: float) -> Optional[dict[str, np.ndarray]]:
+    """
+    Load a fresh Arrow IPC file as {column: ndarray} via mmap.
+    Returns None on miss, expiry, or any read error.
+    """
+    if pa is None or not is_fresh(path, ttl_seconds):
+        return None
+    try:
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    except Exception as e:
+        print(f"[Cache] {path.name}: read failed - {e}")
+        return None
+
+
+def write_arrays(path: Path, columns: dict[str, np.ndarray]) -> None:
+    """Write {column: ndarray} as an uncompressed Arrow IPC file (atomic replace)."""
+    if pa is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.table(columns)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        _purge_expired()
+    except Exception as e:
+        print(f"[Cache] {path.name}: write failed - {e}")
+
+
+def read_text(path: Path, ttl_seconds: float) -> Optional[str]:
+    """Load a fresh cached text entry. Returns None on miss, expiry, or read error."""
+    if not is_fresh(path, ttl_seconds):
+        return None
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError as e:
+        print(f"[Cache] {path.name}: read failed - {e}")
+        return None
+
+
+def write_text(path: Path, text: str) -> None:
+    """Write a text entry (atomic replace)."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+        _purge_expired()
+    except OSError as e:
+        print(f"[Cache] {path.name}: write failed - {e}")
+
+
+def rolling_parquet_cached(
+    namespace: str, ttl_seconds: float, tail_period: str = "5d", max_gap_days: int = 4
+) -> Callable:
+    """
+    Keep one rolling parquet history per (ticker, period, interval) for a
+    fetch_many(tickers, period, interval) -> {ticker: DataFrame} function.
+
+    A ticker's stored history is served as-is while its file is younger than
+    ttl_seconds; the wrapper's refresh=True skips that check. Otherwise, if
+    the stored history ends within max_gap_days, only `tail_period` is fetched: those
+    bars replace any overlap and are appended, and the oldest bars are
+    dropped so the window keeps its length. Tickers with no history, or a
+    longer gap, fetch the full period. All tickers needing the same request
+    share one fetch_many call. Empty frames (failed fetches) are never cached;
+    if a tail fetch fails the stored history is returned as-is.
+    """
+    def decorator(
+        fetch_many: Callable[..., dict[str, pd.DataFrame]]
+    ) -> Callable[..., dict[str, pd.DataFrame]]:
+        @functools.wraps(fetch_many)
+        def wrapper(
+            tickers: list[str], period: str = "1y", interval: str = "1d", refresh: bool = False
+        ) -> dict[str, pd.DataFrame]:
+            if pa is None:
+                return fetch_many(tickers, period, interval)
+
+            gap_cutoff = pd.Timestamp.now() - pd.Timedelta(days=max_gap_days)
+            paths = {t: cache_path(f"{namespace}_{t}_{period}_{interval}.parquet") for t in tickers}
+            frames: dict[str, pd.DataFrame] = {}
+            stale: dict[str, pd.DataFrame] = {}
+
+            for t, path in paths.items():
+                df = _read_parquet(path)
+                if df is None or df.empty:
+                    continue
+                if not refresh and is_fresh(path, ttl_seconds):
+                    frames[t] = df
+                elif df.index[-1] >= gap_cutoff:
+                    stale[t] = df
+
+            if stale:
+                tails = fetch_many(list(stale), tail_period, interval)
+                for t, old in stale.items():
+                    tail = tails.get(t, pd.DataFrame())
+                    if tail.empty:
+                        frames[t] = old
+                        continue
+                    merged = pd.concat([old[old.index < tail.index[0]], tail])
+                    frames[t] = merged.iloc[-max(len(old), len(tail)):]
+                    _write_parquet(paths[t], frames[t])
+
+            full = [t for t in tickers if t not in frames]
+            if full:
+                fetched = fetch_many(full, period, interval)
+                for t in full:
+                    frames[t] = fetched.get(t, pd.DataFrame())
+                    _write_parquet(paths[t], frames[t])
+
+            return {t: frames[t] for t in tickers}
+
+        return wrapper
+    return decorator
+
+
+def _read_parquet(path: Path) -> Optional[pd.DataFrame]:
+    """Cached frame, or None on miss or read error."""
+    if not path.exists():
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(f"[Cache] {path.name}: read failed - {e}")
+        return None
+
+
+def _write_parquet(path: Path, df: pd.DataFrame) -> None:
+    """Atomically write a non-empty frame, then purge expired entries."""
+    if df.empty:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+        _purge_expired()
+    except Exception as e:
+        print(f"[Cache] {path.name}: write failed - {e}")
+
+
+def _purge_expired() -> None:
+    """Delete Arrow, parquet and text entries older than CACHE_MAX_AGE_DAYS."""
+    cutoff = time.time() - CACHE_MAX_AGE_DAYS * 86400
+    for path in [*CACHE_DIR.glob("*.arrow"), *CACHE_DIR.glob("*.parquet"), *CACHE_DIR.glob("*.txt")]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
@@ -4,8 +4,15 @@ Direct HTTP requests to Yahoo Finance API — bypasses yfinance entirely.
 Uses curl_cffi for Chrome impersonation to avoid cloud IP blocking.
 """
 
+import asyncio
+import numpy as np
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Upper bound on concurrent requests in fetch_many_tickers()
+MAX_BATCH_WORKERS = 16
 
 
 def _get_session():
@@ -23,6 +30,22 @@ def _get_session():
         return session
 
 
+def _get_async_session():
+    """Async counterpart of _get_session(); one client is shared by a whole batch."""
+    try:
+        from curl_cffi.requests import AsyncSession
+        return AsyncSession(impersonate="chrome")
+    except ImportError:
+        import httpx
+        return httpx.AsyncClient(
+            http2=True,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+                "Accept": "application/json",
+            },
+        )
+
+
 def _period_to_timestamps(period: str) -> tuple[int, int]:
     """Convert period string to Unix timestamps."""
     now = int(time.time())
@@ -35,65 +58,113 @@ def _period_to_timestamps(period: str) -> tuple[int, int]:
     return now - seconds, now
 
 
-def fetch_ticker_data(ticker: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
-    """
-    Fetch OHLCV data from Yahoo Finance via direct API call.
-    Returns DataFrame with lowercase columns: open, high, low, close, volume.
-    Returns empty DataFrame on failure (never raises).
-    """
-    session = _get_session()
+def _chart_url(ticker: str, period: str, interval: str) -> str:
+    """Build the v8 chart endpoint URL for a ticker."""
     period1, period2 = _period_to_timestamps(period)
-
-    url = (
+    return (
         f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
         f"?period1={period1}&period2={period2}&interval={interval}"
         f"&includePrePost=false&events=div%2Csplit"
     )
 
-    try:
-        response = session.get(url, timeout=15)
 
-        if response.status_code != 200:
-            print(f"[YF] {ticker}: HTTP {response.status_code}")
-            return pd.DataFrame()
+def _parse_chart_response(ticker: str, response) -> pd.DataFrame:
+    """Turn a v8 chart HTTP response into an OHLCV DataFrame (empty on failure)."""
+    if response.status_code != 200:
+        print(f"[YF] {ticker}: HTTP {response.status_code}")
+        return pd.DataFrame()
 
-        data = response.json()
-        chart = data.get("chart", {})
-        result = chart.get("result")
+    data = response.json()
+    chart = data.get("chart", {})
+    result = chart.get("result")
 
-        if not result or len(result) == 0:
-            error = chart.get("error", {})
-            print(f"[YF] {ticker}: {error.get('description', 'No data')}")
-            return pd.DataFrame()
+    if not result or len(result) == 0:
+        error = chart.get("error", {})
+        print(f"[YF] {ticker}: {error.get('description', 'No data')}")
+        return pd.DataFrame()
 
-        result = result[0]
-        timestamps = result.get("timestamp")
+    result = result[0]
+    timestamps = result.get("timestamp")
 
-        if not timestamps:
-            print(f"[YF] {ticker}: No timestamps")
-            return pd.DataFrame()
+    if not timestamps:
+        print(f"[YF] {ticker}: No timestamps")
+        return pd.DataFrame()
 
-        quote = result.get("indicators", {}).get("quote", [{}])[0]
+    quote = result.get("indicators", {}).get("quote", [{}])[0]
 
-        df = pd.DataFrame({
-            "open": quote.get("open", []),
-            "high": quote.get("high", []),
-            "low": quote.get("low", []),
-            "close": quote.get("close", []),
-            "volume": quote.get("volume", []),
-        }, index=pd.to_datetime(timestamps, unit="s", utc=True))
+    # Prices become float64 ndarrays up front (null -> NaN), so the frame holds one
+    # float64 block and downstream .to_numpy() calls on price columns are views
+    df = pd.DataFrame({
+        col: np.array(quote.get(col, []), dtype=np.float64)
+        for col in ("open", "high", "low", "close")
+    }, index=pd.to_datetime(timestamps, unit="s", utc=True))
+    df["volume"] = pd.to_numeric(pd.Series(quote.get("volume", []), index=df.index), errors="coerce")
 
-        df.index = df.index.tz_convert("America/New_York").tz_localize(None)
-        df.index.name = "date"
-        df = df.dropna(subset=["open", "high", "low", "close"])
+    df.index = df.index.tz_convert("America/New_York").tz_localize(None)
+    df.index.name = "date"
+    df = df.dropna(subset=["open", "high", "low", "close"])
+    df["volume"] = df["volume"].fillna(0)
 
-        for col in ["open", "high", "low", "close", "volume"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-        df["volume"] = df["volume"].fillna(0)
+    print(f"[YF] {ticker}: OK - {len(df)} bars")
+    return df
 
-        print(f"[YF] {ticker}: OK - {len(df)} bars")
-        return df
+
+def fetch_ticker_data(ticker: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
+    """
+    Fetch OHLCV data from Yahoo Finance via direct API call.
+    Returns DataFrame with lowercase columns: open, high, low, close, volume.
+    Returns empty DataFrame on failure (never raises).
+    """
+    return _fetch_with_session(_get_session(), ticker, period, interval)
+
+
+def fetch_many_tickers(
+    tickers: list[str], period: str = "1y", interval: str = "1d"
+) -> dict[str, pd.DataFrame]:
+    """
+    Fetch several tickers as one batch over a single shared session, so the
+    connection (TLS handshake, keep-alive pool) is reused across all of them.
+    Sync counterpart of fetch_ticker_data_many() for non-async callers.
+    The v8 chart API is one symbol per request — there is no multi-symbol OHLCV endpoint.
+    Returns {ticker: DataFrame}; failed tickers map to an empty DataFrame (never raises).
+    """
+    if not tickers:
+        return {}
+
+    session = _get_session()
+    with ThreadPoolExecutor(max_workers=min(len(tickers), MAX_BATCH_WORKERS)) as ex:
+        frames = list(ex.map(lambda t: _fetch_with_session(session, t, period, interval), tickers))
+
+    return dict(zip(tickers, frames))
+
+
+def _fetch_with_session(session, ticker: str, period: str, interval: str) -> pd.DataFrame:
+    """Single chart request on an existing session (empty DataFrame on failure)."""
+    try:
+        response = session.get(_chart_url(ticker, period, interval), timeout=15)
+        return _parse_chart_response(ticker, response)
 
     except Exception as e:
         print(f"[YF] {ticker}: Exception - {e}")
         return pd.DataFrame()
+
+
+async def fetch_ticker_data_many(
+    tickers: list[str], period: str = "1y", interval: str = "1d"
+) -> dict[str, pd.DataFrame]:
+    """
+    Fetch several tickers concurrently over one shared async client.
+    Returns {ticker: DataFrame}; failed tickers map to an empty DataFrame (never raises).
+    """
+    async def _one(client, ticker: str) -> pd.DataFrame:
+        try:
+            response = await client.get(_chart_url(ticker, period, interval), timeout=15)
+            return _parse_chart_response(ticker, response)
+        except Exception as e:
+            print(f"[YF] {ticker}: Exception - {e}")
+            return pd.DataFrame()
+
+    async with _get_async_session() as client:
+        frames = await asyncio.gather(*[_one(client, t) for t in tickers])
+
+    return dict(zip(tickers, frames))
@@ -7,10 +7,27 @@ import os
 from datetime import datetime, date
 from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import DESCENDING
+from pymongo import DESCENDING, ReturnDocument
 from bson import ObjectId
 
 
+# Heavy deep-dive fields left out of ticker search results (list view only)
+PLAN_SEARCH_EXCLUDE = {
+    "session_id": 0,
+    "checklist_premarket": 0,
+    "checklist_intraday": 0,
+    "confidence_breakdown": 0,
+    "thesis": 0,
+    "regime_context": 0,
+    "invalidation": 0,
+    "position_kill": 0,
+}
+
+# Plan statuses that count as "entered" in the history view (a list, not a
+# set: it is embedded in the aggregation pipeline and must be BSON-encodable)
+ENTERED_STATUSES = ["entered", "exited", "stopped_out", "reviewed"]
+
+
 class Database:
     """Async MongoDB client for TradePilot."""
 
@@ -20,7 +37,13 @@ class Database:
 
     async def connect(self):
         mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-        self.client = AsyncIOMotorClient(mongo_uri)
+        # One pooled client for the process; minPoolSize keeps warm (already
+        # TLS-handshaken) connections open so requests never pay connection setup
+        self.client = AsyncIOMotorClient(
+            mongo_uri,
+            minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "5")),
+            maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+        )
         self.db = self.client[os.getenv("MONGODB_DB", "tradepilot")]
 
         # Create indexes — existing collections
@@ -36,7 +59,7 @@ class Database:
         # Create indexes — v2 plans collection
         await self.db.plans_v2.create_index([("session_id", 1), ("date", 1)])
         await self.db.plans_v2.create_index([("date", 1), ("status", 1)])
-        await self.db.plans_v2.create_index([("ticker", 1), ("date", 1)])
+        await self.db.plans_v2.create_index([("ticker", 1), ("date", -1)])
         await self.db.plans_v2.create_index("status")
 
     async def disconnect(self):
@@ -165,14 +188,15 @@ class Database:
         # Group by setup type
         setup_stats = {}
         for e in entries:
-            st = e.get("setup_type", "unknown")
-            if st not in setup_stats:
-                setup_stats[st] = {"wins": 0, "losses": 0, "total_pnl": 0}
-            if e.get("pnl_percent", 0) > 0:
-                setup_stats[st]["wins"] += 1
+            bucket = setup_stats.setdefault(
+                e.get("setup_type", "unknown"), {"wins": 0, "losses": 0, "total_pnl": 0}
+            )
+            pnl = e.get("pnl_percent", 0)
+            if pnl > 0:
+                bucket["wins"] += 1
             else:
-                setup_stats[st]["losses"] += 1
-            setup_stats[st]["total_pnl"] += e.get("pnl_percent", 0)
+                bucket["losses"] += 1
+            bucket["total_pnl"] += pnl
 
         return {
             "period_days": days,
@@ -222,10 +246,9 @@ class Database:
     # ─── V2 Plans (lifecycle-tracked) ──────────────────────────────────────
 
     async def create_plan_v2(self, plan: dict) -> str:
-        """Create a new v2 plan. Returns plan ID."""
-        plan["created_at"] = datetime.utcnow()
-        plan["updated_at"] = datetime.utcnow()
-        result = await self.db.plans_v2.insert_one(plan)
+        """Create a new v2 plan. Returns plan ID; `plan` itself is not modified."""
+        now = datetime.utcnow()
+        result = await self.db.plans_v2.insert_one({**plan, "created_at": now, "updated_at": now})
         return str(result.inserted_id)
 
     async def get_plan_v2(self, plan_id: str) -> Optional[dict]:
@@ -265,41 +288,82 @@ class Database:
         )
         return result.modified_count > 0
 
-    async def add_plan_exit(self, plan_id: str, exit_data: dict) -> bool:
-        """Push an exit event to the plan's exits array and update remaining contracts."""
-        result = await self.db.plans_v2.update_one(
-            {"_id": ObjectId(plan_id)},
-            {
-                "$push": {"exits": exit_data},
-                "$set": {
-                    "remaining_contracts": exit_data.get("remaining_after", 0),
-                    "updated_at": datetime.utcnow(),
-                }
-            }
+    async def conditional_update_plan(
+        self,
+        plan_id: str,
+        expected_statuses: list[str],
+        updates: dict,
+        push: Optional[dict] = None,
+        match: Optional[dict] = None,
+    ) -> Optional[dict]:
+        """
+        Atomically $set `updates` (and $push `push`) on a plan only if its status
+        is one of `expected_statuses` and it matches the extra `match` fields.
+        Returns the updated plan, or None if no plan matched (missing, wrong
+        status, or changed since it was read). `updates` is not modified.
+        """
+        update = {"$set": {**updates, "updated_at": datetime.utcnow()}}
+        if push:
+            update["$push"] = push
+        doc = await self.db.plans_v2.find_one_and_update(
+            {"_id": ObjectId(plan_id), "status": {"$in": expected_statuses}, **(match or {})},
+            update,
+            return_document=ReturnDocument.AFTER,
         )
-        return result.modified_count > 0
+        if doc:
+            doc["_id"] = str(doc["_id"])
+        return doc
 
-    async def get_plans_history(self, days: int = 30) -> list[dict]:
-        """Get plan summaries grouped by date for the history view."""
+    async def get_plan_status(self, plan_id: str) -> Optional[str]:
+        """Status of a plan, or None if it doesn't exist."""
+        doc = await self.db.plans_v2.find_one({"_id": ObjectId(plan_id)}, {"status": 1})
+        return doc.get("status") if doc else None
+
+    async def get_plans_history_grouped(self, days: int = 30) -> list[dict]:
+        """
+        Per-date plan buckets for the history view, newest first, aggregated
+        server-side: total P&L, entered count, plans with rules broken, and a
+        slim summary of each plan (not the full documents).
+        """
         cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0)
         from datetime import timedelta
         cutoff_str = (cutoff - timedelta(days=days)).strftime("%Y-%m-%d")
 
-        cursor = self.db.plans_v2.find(
-            {"date": {"$gte": cutoff_str}}
-        ).sort("date", DESCENDING)
-
-        plans = []
-        async for doc in cursor:
-            doc["_id"] = str(doc["_id"])
-            plans.append(doc)
-        return plans
+        pipeline = [
+            {"$match": {"date": {"$gte": cutoff_str}}},
+            {"$group": {
+                "_id": "$date",
+                "plans": {"$push": {
+                    "_id": {"$toString": "$_id"},
+                    "ticker": "$ticker",
+                    "direction": "$direction",
+                    "status": "$status",
+                    "total_pnl_dollars": "$total_pnl_dollars",
+                }},
+                "total_pnl": {"$sum": "$total_pnl_dollars"},
+                "entered_count": {"$sum": {"$cond": [
+                    {"$in": ["$status", ENTERED_STATUSES]}, 1, 0
+                ]}},
+                "rules_broken": {"$sum": {"$cond": [
+                    {"$gt": [{"$ifNull": ["$entry.deviation_count", 0]}, 0]}, 1, 0
+                ]}},
+            }},
+            {"$sort": {"_id": DESCENDING}},
+            {"$project": {
+                "_id": 0, "date": "$_id", "plans": 1,
+                "total_pnl": 1, "entered_count": 1, "rules_broken": 1,
+            }},
+        ]
+        return await self.db.plans_v2.aggregate(pipeline).to_list(length=None)
 
     async def search_plans_by_ticker(self, ticker: str, limit: int = 50) -> list[dict]:
-        """Search all plans for a ticker across all dates."""
+        """
+        Search all plans for a (uppercase) ticker across all dates, newest first.
+        Served by the (ticker, date) index; deep-dive fields are projected out.
+        """
         cursor = (
             self.db.plans_v2
-            .find({"ticker": ticker.upper()})
+            .find({"ticker": ticker}, PLAN_SEARCH_EXCLUDE)
             .sort("date", DESCENDING)
             .limit(limit)
         )
@@ -354,10 +418,10 @@ class Database:
         return ["SPY", "QQQ", "IWM", "DIA", "NVDA", "MSFT", "AAPL", "XLF"]
 
     async def update_watchlist(self, tickers: list[str]) -> bool:
-        """Update saved watchlist."""
+        """Update saved watchlist (tickers already uppercased by the route model)."""
         result = await self.db.watchlist.update_one(
             {"_type": "default_watchlist"},
-            {"$set": {"tickers": [t.upper() for t in tickers], "updated_at": datetime.utcnow()}},
+            {"$set": {"tickers": tickers, "updated_at": datetime.utcnow()}},
             upsert=True
         )
         return True
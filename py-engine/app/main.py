@@ -8,6 +8,7 @@ import uuid
 from datetime import datetime
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from dotenv import load_dotenv
@@ -18,7 +19,7 @@ from app.database import db
 from app.parsers.csv_parser import parse_csv_auto, fetch_yfinance
 from app.indicators.engine import IndicatorEngine
 from app.indicators.confidence import ConfidenceScorer
-from app.regime.engine import RegimeEngine
+from app.regime.engine import RegimeEngine, force_refresh
 from app.catalysts.engine import CatalystEngine
 from app.options.strategy import OptionsStrategyEngine
 from app.routes.llm_pipeline import LLMPipeline
@@ -60,6 +61,8 @@ confidence_scorer = ConfidenceScorer()
 llm_pipeline = LLMPipeline(
     api_key=os.getenv("ANTHROPIC_API_KEY", ""),
     model=os.getenv("LLM_MODEL", "claude-sonnet-4-5-20250514"),
+    max_rpm=int(os.getenv("ANTHROPIC_MAX_RPM") or 0) or None,
+    max_tpm=int(os.getenv("ANTHROPIC_MAX_TPM") or 0) or None,
 )
 
 
@@ -72,6 +75,7 @@ async def startup():
 @app.on_event("shutdown")
 async def shutdown():
     await db.disconnect()
+    await llm_pipeline.aclose()
 
 
 # ─── Request Models ───────────────────────────────────────────────────────────
@@ -116,16 +120,20 @@ async def health():
 # ─── Session Initialization ──────────────────────────────────────────────────
 
 @app.post("/api/session/init")
-async def init_session(watchlist: list[str] = []):
+async def init_session(watchlist: list[str] = [], refresh: bool = False):
     """
     Initialize session context — runs Stages 1 & 2.
     Call this once at the start of your trading day.
     Returns session_id for subsequent ticker analyses.
+    Pass refresh=true to re-fetch live regime data and bypass the cached
+    Stage 1 macro/news search.
     """
     try:
         session_id = str(uuid.uuid4())[:8]
 
         # Run regime engine (fetches SPY, QQQ, VIX, sectors)
+        if refresh:
+            force_refresh()
         regime = regime_engine.analyze()
 
         # Run catalyst engine (fetches earnings calendar)
@@ -135,11 +143,12 @@ async def init_session(watchlist: list[str] = []):
         cross_asset = fetch_cross_asset_data()
 
         # Run LLM Stages 1 & 2 (now with cross-asset context)
-        session = llm_pipeline.run_session_stages(
+        session = await llm_pipeline.run_session_stages(
             regime=regime,
             catalysts=catalysts,
             session_id=session_id,
             cross_asset_data=cross_asset,
+            refresh_stage1=refresh,
         )
 
         # Cache session in MongoDB
@@ -252,7 +261,7 @@ async def analyze_with_upload(
         )
 
         # Run LLM Stages 3-5
-        plan = llm_pipeline.analyze_ticker(
+        plan = await llm_pipeline.analyze_ticker(
             indicators=snapshot,
             confidence=confidence,
             options_rec=options_rec,
@@ -336,7 +345,7 @@ async def analyze_quick(req: QuickAnalyzeRequest):
         )
 
         # LLM Stages 3-5
-        plan = llm_pipeline.analyze_ticker(
+        plan = await llm_pipeline.analyze_ticker(
             indicators=snapshot, confidence=confidence, options_rec=options_rec,
             trade_type=tt, direction=dir_, prior_trades=prior[:5],
             correlated_bellwethers=correlated,
@@ -388,7 +397,7 @@ async def log_trade(req: JournalRequest):
         if plan:
             from app.models.schemas import TradePlan
             plan_obj = TradePlan(**{k: v for k, v in plan.items() if k != "_id"})
-            debrief = llm_pipeline.generate_debrief(plan_obj, entry)
+            debrief = await llm_pipeline.generate_debrief(plan_obj, entry)
             entry["ai_debrief"] = debrief
 
         # Save to MongoDB
@@ -426,7 +435,7 @@ async def weekly_digest():
     if not entries:
         return {"digest": "No trades to analyze."}
 
-    digest = llm_pipeline.generate_weekly_digest(entries)
+    digest = await llm_pipeline.generate_weekly_digest(entries)
     return {"digest": digest}
 
 
@@ -515,7 +524,7 @@ async def chat(req: ChatRequest):
         perf = await db.get_performance_stats(30)
 
         # Run chat
-        response = llm_pipeline.chat(
+        response = await llm_pipeline.chat(
             messages=req.messages,
             trade_plans=plans,
             performance_stats=perf,
@@ -529,6 +538,31 @@ async def chat(req: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Streaming version of /api/chat: the reply is sent as plain text chunks
+    as it is generated, so the UI can render it immediately.
+    """
+    if not llm_pipeline.session_context:
+        raise HTTPException(
+            status_code=400,
+            detail="No active session. Call /api/session/init first."
+        )
+
+    plans = await db.get_recent_plans(10)
+    perf = await db.get_performance_stats(30)
+
+    return StreamingResponse(
+        llm_pipeline.chat_stream(
+            messages=req.messages,
+            trade_plans=plans,
+            performance_stats=perf,
+        ),
+        media_type="text/plain; charset=utf-8",
+    )
+
+
 # ─── Catalyst Data (continued) ───────────────────────────────────────────────
 
 @app.get("/api/catalysts/bellwethers")
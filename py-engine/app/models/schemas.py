@@ -359,5 +359,11 @@ class SessionContext(BaseModel):
     regime: MarketRegime
     catalysts: CatalystContext
     cross_asset_data: Optional[dict] = None  # bonds, credit, commodities, dollar, breadth
+    cross_asset_text: str = ""  # cross_asset_data formatted for the LLM
+    date_str: str = ""  # session date as shown in prompts, e.g. "2025-03-10 Monday"
+    sector_leaders_text: str = ""  # regime.sector_leaders / laggards formatted for the LLM
+    sector_laggards_text: str = ""
     stage1_output: str = ""  # raw LLM output from Stage 1
     stage2_output: str = ""  # raw LLM output from Stage 2
+    stage1_summary: str = ""  # short digests of the above, sent with every per-ticker stage
+    stage2_summary: str = ""
@@ -11,6 +11,99 @@ from app.models.schemas import (
 from typing import Optional
 
 
+# ─── Direction Lookups ───────────────────────────────────────────────────────
+# Only defined for directional trades; callers guard against Direction.NEUTRAL.
+
+_LONG_MAP = {
+    Direction.BULLISH: OptionsStrategy.LONG_CALL,
+    Direction.BEARISH: OptionsStrategy.LONG_PUT,
+}
+_SPREAD_MAP = {
+    Direction.BULLISH: OptionsStrategy.BULL_CALL_SPREAD,
+    Direction.BEARISH: OptionsStrategy.BEAR_PUT_SPREAD,
+}
+_SIDE = {Direction.BULLISH: "call", Direction.BEARISH: "put"}
+_SPREAD_NAME = {Direction.BULLISH: "Bull call", Direction.BEARISH: "Bear put"}
+
+
+# ─── Rationale / Structure Templates ─────────────────────────────────────────
+# Only the score/IV/side placeholders vary per call; the prose is fixed per branch.
+
+_DAY_HIGH_CONF_RATIONALE = (
+    "High confidence ({score:.0f}) day trade. Direct long options "
+    "for leverage. IV rank {iv:.0f} is acceptable for intraday hold."
+)
+_DAY_HIGH_CONF_STRUCTURE = (
+    "Buy ATM or slightly OTM {side}, "
+    "0-2 DTE for gamma. Target 50% profit, stop at 30%."
+)
+_DAY_MODERATE_CONF_RATIONALE = (
+    "Moderate confidence ({score:.0f}) day trade. Debit spread "
+    "caps risk while maintaining directional exposure. "
+    "Better risk/reward than naked long in uncertain conditions."
+)
+_DAY_MODERATE_CONF_STRUCTURE = "{spread} spread, tight strikes ($1-2 wide), 0-5 DTE."
+_DAY_LOW_CONF_RATIONALE = (
+    "Low confidence ({score:.0f}). Options leverage is inappropriate. "
+    "Trade stock for reduced risk, or wait for better setup."
+)
+_SWING_HIGH_IV_BULL_RATIONALE = (
+    "IV rank {iv:.0f} is elevated — favor selling premium. "
+    "Bull put spread collects credit with defined downside risk. "
+    "Theta decay works in your favor."
+)
+_SWING_HIGH_IV_BEAR_RATIONALE = (
+    "IV rank {iv:.0f} is elevated — favor selling premium. "
+    "Bear call spread profits from theta + directional move down."
+)
+_SWING_HIGH_IV_NEUTRAL_RATIONALE = (
+    "High IV ({iv:.0f}) + neutral/low-conviction direction. "
+    "Iron condor profits from range-bound action and IV crush."
+)
+_SWING_LOW_IV_HIGH_CONF_RATIONALE = (
+    "IV rank {iv:.0f} is low — premium is cheap. "
+    "High confidence ({score:.0f}) supports directional long options. "
+    "Potential for IV expansion adds to profit."
+)
+_SWING_LOW_IV_HIGH_CONF_STRUCTURE = (
+    "Buy {side}, ATM or 1 strike OTM. 30-60 DTE for time. "
+    "Look for potential IV expansion catalyst."
+)
+_SWING_LOW_IV_SPREAD_RATIONALE = (
+    "Low IV ({iv:.0f}) + moderate confidence ({score:.0f}). "
+    "Debit spread is cost-effective with defined max loss."
+)
+_SWING_LOW_IV_SPREAD_STRUCTURE = "{spread} spread, 21-45 DTE. Strikes around key technical levels."
+_SWING_MID_IV_HIGH_CONF_RATIONALE = (
+    "Mid IV ({iv:.0f}) + high confidence ({score:.0f}). "
+    "Strong setup justifies long premium exposure."
+)
+_SWING_MID_IV_HIGH_CONF_STRUCTURE = "Buy {side}, ATM to slightly OTM. 30-45 DTE."
+_SWING_MID_IV_SPREAD_RATIONALE = (
+    "Mid IV ({iv:.0f}) + moderate confidence ({score:.0f}). "
+    "Debit spread balances directional exposure with defined risk."
+)
+_SWING_MID_IV_SPREAD_STRUCTURE = "{spread} spread, 21-45 DTE."
+_SWING_NO_EDGE_RATIONALE = (
+    "No clear directional edge (score: {score:.0f}). "
+    "Avoid options. Trade stock or wait."
+)
+_EARNINGS_CONDOR_RATIONALE = (
+    "Earnings within 3 days. IV is elevated (rank: {iv:.0f}). "
+    "Iron condor profits from post-earnings IV crush "
+    "if stock stays within expected move."
+)
+_EARNINGS_DIRECTIONAL_RATIONALE = (
+    "High conviction ({score:.0f}) directional earnings play. "
+    "WARNING: IV crush will erode premium post-earnings even if "
+    "direction is correct. Stock must move beyond expected move to profit."
+)
+_EARNINGS_DIRECTIONAL_STRUCTURE = (
+    "Buy {side}, slightly OTM past expected move. Use defined risk (debit spread) "
+    "to reduce IV crush impact."
+)
+
+
 class OptionsStrategyEngine:
     """
     Selects options strategy based on:
@@ -54,42 +147,27 @@ class OptionsStrategyEngine:
 
         # High confidence → direct long options
         if score >= 70 and direction != Direction.NEUTRAL:
-            strategy = OptionsStrategy.LONG_CALL if direction == Direction.BULLISH else OptionsStrategy.LONG_PUT
+            strategy = _LONG_MAP[direction]
             return OptionsRecommendation(
                 strategy=strategy,
-                rationale=(
-                    f"High confidence ({score:.0f}) day trade. Direct long options "
-                    f"for leverage. IV rank {iv_rank:.0f} is acceptable for intraday hold."
-                ),
-                structure=f"Buy ATM or slightly OTM {'call' if direction == Direction.BULLISH else 'put'}, "
-                          f"0-2 DTE for gamma. Target 50% profit, stop at 30%.",
+                rationale=_DAY_HIGH_CONF_RATIONALE.format(score=score, iv=iv_rank),
+                structure=_DAY_HIGH_CONF_STRUCTURE.format(side=_SIDE[direction]),
             )
 
         # Moderate confidence → defined risk spread
         if score >= 50 and direction != Direction.NEUTRAL:
-            if direction == Direction.BULLISH:
-                strategy = OptionsStrategy.BULL_CALL_SPREAD
-            else:
-                strategy = OptionsStrategy.BEAR_PUT_SPREAD
+            strategy = _SPREAD_MAP[direction]
 
             return OptionsRecommendation(
                 strategy=strategy,
-                rationale=(
-                    f"Moderate confidence ({score:.0f}) day trade. Debit spread "
-                    f"caps risk while maintaining directional exposure. "
-                    f"Better risk/reward than naked long in uncertain conditions."
-                ),
-                structure=f"{'Bull call' if direction == Direction.BULLISH else 'Bear put'} spread, "
-                          f"tight strikes ($1-2 wide), 0-5 DTE.",
+                rationale=_DAY_MODERATE_CONF_RATIONALE.format(score=score),
+                structure=_DAY_MODERATE_CONF_STRUCTURE.format(spread=_SPREAD_NAME[direction]),
             )
 
         # Low confidence → stock only or pass
         return OptionsRecommendation(
             strategy=OptionsStrategy.STOCK_ONLY,
-            rationale=(
-                f"Low confidence ({score:.0f}). Options leverage is inappropriate. "
-                f"Trade stock for reduced risk, or wait for better setup."
-            ),
+            rationale=_DAY_LOW_CONF_RATIONALE.format(score=score),
             structure="Stock shares only. Smaller position size.",
         )
 
@@ -104,31 +182,21 @@ class OptionsStrategyEngine:
             if direction == Direction.BULLISH and score >= 55:
                 return OptionsRecommendation(
                     strategy=OptionsStrategy.BULL_PUT_SPREAD,
-                    rationale=(
-                        f"IV rank {iv_rank:.0f} is elevated — favor selling premium. "
-                        f"Bull put spread collects credit with defined downside risk. "
-                        f"Theta decay works in your favor."
-                    ),
+                    rationale=_SWING_HIGH_IV_BULL_RATIONALE.format(iv=iv_rank),
                     structure="Sell put spread below support. 30-45 DTE. "
                               "Short strike at or below key support level.",
                 )
             elif direction == Direction.BEARISH and score >= 55:
                 return OptionsRecommendation(
                     strategy=OptionsStrategy.BEAR_CALL_SPREAD,
-                    rationale=(
-                        f"IV rank {iv_rank:.0f} is elevated — favor selling premium. "
-                        f"Bear call spread profits from theta + directional move down."
-                    ),
+                    rationale=_SWING_HIGH_IV_BEAR_RATIONALE.format(iv=iv_rank),
                     structure="Sell call spread above resistance. 30-45 DTE. "
                               "Short strike at or above key resistance level.",
                 )
             elif direction == Direction.NEUTRAL or score < 55:
                 return OptionsRecommendation(
                     strategy=OptionsStrategy.IRON_CONDOR,
-                    rationale=(
-                        f"High IV ({iv_rank:.0f}) + neutral/low-conviction direction. "
-                        f"Iron condor profits from range-bound action and IV crush."
-                    ),
+                    rationale=_SWING_HIGH_IV_NEUTRAL_RATIONALE.format(iv=iv_rank),
                     structure="Iron condor with wings outside expected move. 30-45 DTE. "
                               "Manage at 50% max profit or 2x credit received loss.",
                 )
@@ -136,72 +204,47 @@ class OptionsStrategyEngine:
         # ─── Low IV → Buy premium ────────────────────────────────────────
         if iv_rank < 30:
             if score >= 65 and direction != Direction.NEUTRAL:
-                strategy = OptionsStrategy.LONG_CALL if direction == Direction.BULLISH else OptionsStrategy.LONG_PUT
+                strategy = _LONG_MAP[direction]
                 return OptionsRecommendation(
                     strategy=strategy,
-                    rationale=(
-                        f"IV rank {iv_rank:.0f} is low — premium is cheap. "
-                        f"High confidence ({score:.0f}) supports directional long options. "
-                        f"Potential for IV expansion adds to profit."
-                    ),
-                    structure=f"Buy {'call' if direction == Direction.BULLISH else 'put'}, "
-                              f"ATM or 1 strike OTM. 30-60 DTE for time. "
-                              f"Look for potential IV expansion catalyst.",
+                    rationale=_SWING_LOW_IV_HIGH_CONF_RATIONALE.format(score=score, iv=iv_rank),
+                    structure=_SWING_LOW_IV_HIGH_CONF_STRUCTURE.format(side=_SIDE[direction]),
                 )
 
             # Lower confidence + low IV → debit spread for defined risk
             if direction != Direction.NEUTRAL:
-                if direction == Direction.BULLISH:
-                    strategy = OptionsStrategy.BULL_CALL_SPREAD
-                else:
-                    strategy = OptionsStrategy.BEAR_PUT_SPREAD
+                strategy = _SPREAD_MAP[direction]
 
                 return OptionsRecommendation(
                     strategy=strategy,
-                    rationale=(
-                        f"Low IV ({iv_rank:.0f}) + moderate confidence ({score:.0f}). "
-                        f"Debit spread is cost-effective with defined max loss."
-                    ),
-                    structure=f"{'Bull call' if direction == Direction.BULLISH else 'Bear put'} spread, "
-                              f"21-45 DTE. Strikes around key technical levels.",
+                    rationale=_SWING_LOW_IV_SPREAD_RATIONALE.format(score=score, iv=iv_rank),
+                    structure=_SWING_LOW_IV_SPREAD_STRUCTURE.format(spread=_SPREAD_NAME[direction]),
                 )
 
         # ─── Mid IV → Context-dependent ──────────────────────────────────
         if score >= 70 and direction != Direction.NEUTRAL:
             # High conviction in mid-IV → long options
-            strategy = OptionsStrategy.LONG_CALL if direction == Direction.BULLISH else OptionsStrategy.LONG_PUT
+            strategy = _LONG_MAP[direction]
             return OptionsRecommendation(
                 strategy=strategy,
-                rationale=(
-                    f"Mid IV ({iv_rank:.0f}) + high confidence ({score:.0f}). "
-                    f"Strong setup justifies long premium exposure."
-                ),
-                structure=f"Buy {'call' if direction == Direction.BULLISH else 'put'}, "
-                          f"ATM to slightly OTM. 30-45 DTE.",
+                rationale=_SWING_MID_IV_HIGH_CONF_RATIONALE.format(score=score, iv=iv_rank),
+                structure=_SWING_MID_IV_HIGH_CONF_STRUCTURE.format(side=_SIDE[direction]),
             )
 
         if direction != Direction.NEUTRAL:
             # Default swing: debit spread
-            if direction == Direction.BULLISH:
-                strategy = OptionsStrategy.BULL_CALL_SPREAD
-            else:
-                strategy = OptionsStrategy.BEAR_PUT_SPREAD
+            strategy = _SPREAD_MAP[direction]
 
             return OptionsRecommendation(
                 strategy=strategy,
-                rationale=(
-                    f"Mid IV ({iv_rank:.0f}) + moderate confidence ({score:.0f}). "
-                    f"Debit spread balances directional exposure with defined risk."
-                ),
-                structure=f"{'Bull call' if direction == Direction.BULLISH else 'Bear put'} spread, "
-                          f"21-45 DTE.",
+                rationale=_SWING_MID_IV_SPREAD_RATIONALE.format(score=score, iv=iv_rank),
+                structure=_SWING_MID_IV_SPREAD_STRUCTURE.format(spread=_SPREAD_NAME[direction]),
             )
 
         # Neutral / no edge
         return OptionsRecommendation(
             strategy=OptionsStrategy.STOCK_ONLY,
-            rationale=f"No clear directional edge (score: {score:.0f}). "
-                      f"Avoid options. Trade stock or wait.",
+            rationale=_SWING_NO_EDGE_RATIONALE.format(score=score),
             structure="Stock only or no trade.",
         )
 
@@ -214,36 +257,26 @@ class OptionsStrategyEngine:
         if direction == Direction.NEUTRAL or score < 60:
             return OptionsRecommendation(
                 strategy=OptionsStrategy.IRON_CONDOR,
-                rationale=(
-                    f"Earnings within 3 days. IV is elevated (rank: {iv_rank:.0f}). "
-                    f"Iron condor profits from post-earnings IV crush "
-                    f"if stock stays within expected move."
-                ),
+                rationale=_EARNINGS_CONDOR_RATIONALE.format(iv=iv_rank),
                 structure="Iron condor with wings at expected move boundaries. "
                           "Expiry immediately after earnings.",
             )
 
         if score >= 70:
             # High conviction directional earnings play
-            strategy = OptionsStrategy.LONG_CALL if direction == Direction.BULLISH else OptionsStrategy.LONG_PUT
+            strategy = _LONG_MAP[direction]
             return OptionsRecommendation(
                 strategy=strategy,
-                rationale=(
-                    f"High conviction ({score:.0f}) directional earnings play. "
-                    f"WARNING: IV crush will erode premium post-earnings even if "
-                    f"direction is correct. Stock must move beyond expected move to profit."
-                ),
-                structure=f"Buy {'call' if direction == Direction.BULLISH else 'put'}, "
-                          f"slightly OTM past expected move. Use defined risk (debit spread) "
-                          f"to reduce IV crush impact.",
+                rationale=_EARNINGS_DIRECTIONAL_RATIONALE.format(score=score),
+                structure=_EARNINGS_DIRECTIONAL_STRUCTURE.format(side=_SIDE[direction]),
             )
 
         # Moderate conviction → straddle/strangle for vol expansion
         return OptionsRecommendation(
             strategy=OptionsStrategy.STRANGLE,
             rationale=(
-                f"Earnings play with directional lean but not enough conviction "
-                f"for pure directional. Strangle profits from large move in either direction."
+                "Earnings play with directional lean but not enough conviction "
+                "for pure directional. Strangle profits from large move in either direction."
             ),
             structure="Buy strangle: OTM call + OTM put, expiry right after earnings. "
                       "Requires move beyond both breakevens.",
@@ -1 +1 @@
-from .csv_parser import parse_thinkorswim, parse_tradingview, parse_csv_auto, fetch_yfinance
+from .csv_parser import parse_thinkorswim, parse_tradingview, parse_csv_auto, parse_csv_auto_batch, fetch_yfinance, fetch_yfinance_many
@@ -3,12 +3,29 @@ TradePilot CSV Parsers
 Normalize ThinkorSwim and TradingView exports into unified TickerData format.
 """
 
+import csv
+import os
+import re
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from io import StringIO, BytesIO
 from datetime import datetime
 from typing import Optional
 from app.models.schemas import OHLCVBar, TickerData, Timeframe
+from app.data.disk_cache import cache_path, read_arrays, write_arrays
+
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Rows per read_csv chunk — bounds peak memory on multi-year intraday exports
+CSV_CHUNK_ROWS = 65536
+
+# Any three of these in one line marks the OHLCV header row
+_HEADER_RX = re.compile(r"open|high|low|close")
+
+# Exports up to this many characters skip pandas and go through the csv module
+SMALL_CSV_MAX_CHARS = 1_000_000
 
 
 # ─── ThinkorSwim Parser ──────────────────────────────────────────────────────
@@ -35,33 +52,11 @@ def parse_thinkorswim(
 
     data_str = "\n".join(lines[header_idx:])
     delimiter = "\t" if "\t" in lines[header_idx] else ","
-    df = pd.read_csv(StringIO(data_str), delimiter=delimiter)
-
-    df.columns = _normalize_columns(df.columns)
-    df["timestamp"] = pd.to_datetime(df["date"], format="mixed", dayfirst=False)
-    df = df.sort_values("timestamp").reset_index(drop=True)
-
-    for col in ["open", "high", "low", "close", "volume"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce")
-
-    if "volume" not in df.columns:
-        df["volume"] = 0
-    df["volume"] = df["volume"].fillna(0)
-
-    df = df.dropna(subset=["open", "high", "low", "close"])
-
-    bars = [
-        OHLCVBar(
-            timestamp=row["timestamp"],
-            open=row["open"],
-            high=row["high"],
-            low=row["low"],
-            close=row["close"],
-            volume=row["volume"]
-        )
-        for _, row in df.iterrows()
-    ]
+    if len(data_str) > SMALL_CSV_MAX_CHARS:
+        arrays = _read_thinkorswim_chunked(data_str, delimiter)
+    else:
+        arrays = _read_thinkorswim_small(data_str, delimiter)
+    bars = _bars_from_arrays(*arrays)
 
     return TickerData(
         ticker=ticker.upper(),
@@ -97,7 +92,9 @@ def parse_tradingview(
 
     df = df.sort_values("timestamp").reset_index(drop=True)
 
-    for col in ["open", "high", "low", "close", "volume"]:
+    # Per column: a mixed int/object frame converted as one block would be
+    # cast back to int, truncating prices
+    for col in OHLCV_COLUMNS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
 
@@ -161,8 +158,41 @@ def parse_csv_auto(
         return parse_tradingview(file_content, ticker, timeframe)
 
 
+def parse_csv_auto_batch(
+    payloads: list[tuple[bytes | str, str, Timeframe, Optional[str]]]
+) -> list[TickerData]:
+    """
+    Parse many uploads at once. Each payload is (content, ticker, timeframe, source).
+    Files are independent, so they are parsed across worker processes.
+    Results are returned in the same order as the payloads.
+    """
+    if len(payloads) <= 1:
+        return [_parse_one(p) for p in payloads]
+
+    workers = min(len(payloads), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(_parse_one, payloads))
+
+
+def _parse_one(payload: tuple[bytes | str, str, Timeframe, Optional[str]]) -> TickerData:
+    """Worker entry point for parse_csv_auto_batch (must be module-level to pickle)."""
+    content, ticker, timeframe, source = payload
+    return parse_csv_auto(content, ticker, timeframe, source)
+
+
 # ─── yfinance Fetcher ─────────────────────────────────────────────────────────
 
+# Seconds a fetched history is reused from disk before re-fetching
+YFINANCE_CACHE_TTL = 300
+
+# Map interval string to Timeframe enum
+INTERVAL_TIMEFRAMES = {
+    "1m": Timeframe.M1, "5m": Timeframe.M5, "15m": Timeframe.M15,
+    "30m": Timeframe.M30, "1h": Timeframe.H1, "1d": Timeframe.DAILY,
+    "1wk": Timeframe.WEEKLY
+}
+
+
 def fetch_yfinance(
     ticker: str,
     period: str = "6mo",
@@ -171,33 +201,55 @@ def fetch_yfinance(
     """
     Fetch OHLCV data from Yahoo Finance using direct API calls.
     No yfinance library dependency — uses app.data.yahoo_fetcher.
+    Results are cached on disk for YFINANCE_CACHE_TTL seconds.
     """
     from app.data.yahoo_fetcher import fetch_ticker_data
 
+    path = cache_path(f"{ticker.upper()}_{interval}_{period}.arrow")
+    cached = read_arrays(path, YFINANCE_CACHE_TTL)
+    if cached is not None:
+        return TickerData(
+            ticker=ticker.upper(),
+            timeframe=INTERVAL_TIMEFRAMES.get(interval, Timeframe.DAILY),
+            bars=_bars_from_arrays(*(cached[c] for c in ["timestamp", *OHLCV_COLUMNS])),
+            source="yfinance"
+        )
+
     df = fetch_ticker_data(ticker, period=period, interval=interval)
+    ticker_data = _yahoo_frame_to_ticker_data(df, ticker, interval)
+
+    write_arrays(path, {
+        "timestamp": df.index.to_numpy(),
+        **{col: df[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS},
+    })
+    return ticker_data
+
+
+async def fetch_yfinance_many(
+    tickers: list[str],
+    period: str = "6mo",
+    interval: str = "1d"
+) -> list[TickerData]:
+    """
+    Fetch several tickers concurrently (one shared async HTTP client).
+    Returns TickerData in the same order as tickers.
+    """
+    from app.data.yahoo_fetcher import fetch_ticker_data_many
 
+    frames = await fetch_ticker_data_many(tickers, period=period, interval=interval)
+    return [_yahoo_frame_to_ticker_data(frames[t], t, interval) for t in tickers]
+
+
+def _yahoo_frame_to_ticker_data(df: pd.DataFrame, ticker: str, interval: str) -> TickerData:
+    """Convert a yahoo_fetcher DataFrame into TickerData."""
     if df.empty:
         raise ValueError(f"No data returned from Yahoo Finance for {ticker}")
 
-    # Map interval string to Timeframe enum
-    interval_map = {
-        "1m": Timeframe.M1, "5m": Timeframe.M5, "15m": Timeframe.M15,
-        "30m": Timeframe.M30, "1h": Timeframe.H1, "1d": Timeframe.DAILY,
-        "1wk": Timeframe.WEEKLY
-    }
-    tf = interval_map.get(interval, Timeframe.DAILY)
-
-    bars = [
-        OHLCVBar(
-            timestamp=idx.to_pydatetime(),
-            open=row["open"],
-            high=row["high"],
-            low=row["low"],
-            close=row["close"],
-            volume=row["volume"]
-        )
-        for idx, row in df.iterrows()
-    ]
+    tf = INTERVAL_TIMEFRAMES.get(interval, Timeframe.DAILY)
+    bars = _bars_from_arrays(
+        df.index.to_numpy(),
+        *(df[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS),
+    )
 
     return TickerData(
         ticker=ticker.upper(),
@@ -211,16 +263,109 @@ def fetch_yfinance(
 
 def _find_header_row(lines: list[str]) -> Optional[int]:
     """Find the row index that contains OHLCV headers."""
-    target_cols = {"open", "high", "low", "close"}
-
     for i, line in enumerate(lines[:20]):
-        lower = line.lower()
-        matches = sum(1 for col in target_cols if col in lower)
+        matches = len(set(_HEADER_RX.findall(line.lower())))
         if matches >= 3:
             return i
     return None
 
 
+def _read_thinkorswim_small(data_str: str, delimiter: str) -> tuple[np.ndarray, ...]:
+    """
+    csv-module reader for typical (<1MB) exports, where DataFrame construction
+    costs more than the parsing itself. Same return shape as _read_thinkorswim_chunked.
+    """
+    rows = [row for row in csv.reader(StringIO(data_str), delimiter=delimiter) if row]
+    header = list(_normalize_columns(pd.Index(rows[0])))
+    data = rows[1:]
+    n = len(data)
+
+    def column(name: str) -> list[str]:
+        idx = header.index(name)  # ValueError → KeyError below, matching pandas
+        return [row[idx] if idx < len(row) else "" for row in data]
+
+    def numeric(name: str) -> np.ndarray:
+        return np.fromiter((_to_float(x) for x in column(name)), dtype=np.float64, count=n)
+
+    try:
+        dates = column("date")
+        open_, high, low, close = (numeric(c) for c in ("open", "high", "low", "close"))
+    except ValueError as e:
+        raise KeyError(str(e)) from e
+
+    volume = numeric("volume") if "volume" in header else np.zeros(n)
+    timestamp = pd.to_datetime(dates, format="mixed", dayfirst=False).to_numpy()
+
+    return timestamp, open_, high, low, close, volume
+
+
+def _read_thinkorswim_chunked(data_str: str, delimiter: str) -> tuple[np.ndarray, ...]:
+    """
+    Stream a ThinkorSwim export through read_csv in CSV_CHUNK_ROWS pieces.
+    Only the timestamp + OHLCV columns of each chunk are kept (as NumPy arrays),
+    then concatenated once. Returns (timestamp, open, high, low, close, volume).
+    """
+    reader = pd.read_csv(
+        StringIO(data_str), delimiter=delimiter, thousands=",", chunksize=CSV_CHUNK_ROWS
+    )
+
+    parts: dict[str, list[np.ndarray]] = {col: [] for col in ["timestamp", *OHLCV_COLUMNS]}
+    for chunk in reader:
+        chunk.columns = _normalize_columns(chunk.columns)
+        parts["timestamp"].append(
+            pd.to_datetime(chunk["date"], format="mixed", dayfirst=False).to_numpy()
+        )
+        for col in OHLCV_COLUMNS:
+            if col in chunk.columns:
+                values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+            elif col == "volume":
+                values = np.zeros(len(chunk))
+            else:
+                raise KeyError(col)
+            parts[col].append(values)
+
+    if not parts["timestamp"]:
+        return tuple(np.empty(0) for _ in parts)
+    return tuple(np.concatenate(parts[col]) for col in parts)
+
+
+def _bars_from_arrays(
+    timestamp: np.ndarray,
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+) -> list[OHLCVBar]:
+    """
+    Build a time-sorted bar list from column arrays.
+    Rows missing any of open/high/low/close are dropped; missing volume becomes 0.
+    """
+    valid = ~(np.isnan(open_) | np.isnan(high) | np.isnan(low) | np.isnan(close))
+    order = np.argsort(timestamp[valid], kind="stable")
+
+    def pick(arr: np.ndarray) -> list:
+        return arr[valid][order].tolist()
+
+    volume = np.nan_to_num(volume, nan=0.0)
+    timestamps = pd.DatetimeIndex(timestamp[valid][order]).to_pydatetime()
+
+    return [
+        OHLCVBar(timestamp=ts, open=o, high=h, low=lo, close=c, volume=v)
+        for ts, o, h, lo, c, v in zip(
+            timestamps, pick(open_), pick(high), pick(low), pick(close), pick(volume)
+        )
+    ]
+
+
+def _to_float(value: str) -> float:
+    """Parse a numeric cell, tolerating thousands separators; NaN if unparseable."""
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
 def _normalize_columns(columns: pd.Index) -> pd.Index:
     """Normalize column names to lowercase standard format."""
     mapping = {}
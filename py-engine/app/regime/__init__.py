@@ -1 +1 @@
-from .engine import RegimeEngine
+from .engine import RegimeEngine, force_refresh
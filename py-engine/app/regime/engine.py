@@ -4,15 +4,18 @@ Classifies the current market environment using SPY, QQQ, VIX, and sector data.
 Runs once per session and is cached.
 """
 
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from app.models.schemas import (
     MarketRegime, RegimeType, Direction, SectorRotation
 )
-from app.indicators.engine import IndicatorEngine
-from app.data.yahoo_fetcher import fetch_ticker_data
+from app.data.yahoo_fetcher import fetch_many_tickers
+from app.data.disk_cache import rolling_parquet_cached
+from app.regime.kernels import regime_indicators, ema_alphas, RSI_PERIOD, ATR_PERIOD
 
 
 # Sector ETFs for rotation analysis
@@ -31,6 +34,65 @@ SECTOR_ETFS = {
 }
 
 
+# Broad-market tickers fetched alongside the sector ETFs
+BROAD_TICKERS = ("SPY", "QQQ", "^VIX")
+
+# Trailing daily bars used for sector performance (~1 month)
+SECTOR_LOOKBACK_BARS = 21
+
+# Bars of SPY/QQQ/VIX history kept on the engine after analyze()
+RETAINED_BARS = 10
+
+EMA_COLUMNS = ("ema_9", "ema_20", "ema_50", "ema_200")
+
+# Columns read by _classify_regime, in positional order
+CLASSIFY_COLUMNS = ["close", *EMA_COLUMNS, "atr_14"]
+
+# Trend regime by (EMAs price is above, slope bucket); slope buckets are
+# 2: > 0.5%, 1: > 0, 0: flat, -1: < 0, -2: < -0.5%. Missing keys are RANGE_BOUND.
+_REGIME_TABLE: dict[tuple[int, int], RegimeType] = {
+    (4, 2): RegimeType.STRONG_UPTREND,
+    (4, 1): RegimeType.UPTREND,
+    (3, 2): RegimeType.UPTREND,
+    (3, 1): RegimeType.UPTREND,
+    (1, -2): RegimeType.STRONG_DOWNTREND,
+    (0, -2): RegimeType.STRONG_DOWNTREND,
+    (1, -1): RegimeType.DOWNTREND,
+    (0, -1): RegimeType.DOWNTREND,
+}
+
+
+_UPTRENDS = {RegimeType.STRONG_UPTREND, RegimeType.UPTREND}
+_DOWNTRENDS = {RegimeType.STRONG_DOWNTREND, RegimeType.DOWNTREND}
+
+# Overall-bias signals as (predicate(spy_regime, vix, vix_term), weight)
+_BULL_RULES = [
+    (lambda spy_regime, vix, term: spy_regime in _UPTRENDS, 2),
+    (lambda spy_regime, vix, term: vix < 18, 1),
+    (lambda spy_regime, vix, term: term == "contango", 1),
+]
+_BEAR_RULES = [
+    (lambda spy_regime, vix, term: spy_regime in _DOWNTRENDS, 2),
+    (lambda spy_regime, vix, term: vix > 25, 1),
+    (lambda spy_regime, vix, term: term != "contango", 1),
+]
+
+# Seconds a computed MarketRegime (and the on-disk histories) are reused
+REGIME_CACHE_TTL = 300
+
+# Every ticker the regime analysis fetches, in one batch
+REGIME_TICKERS = [*BROAD_TICKERS, *SECTOR_ETFS.values()]
+
+
+@rolling_parquet_cached("regime", ttl_seconds=REGIME_CACHE_TTL, tail_period="5d")
+def _fetch_histories(tickers: list[str], period: str = "1y", interval: str = "1d") -> dict[str, pd.DataFrame]:
+    """
+    Raw OHLCV for every regime ticker in one batch. Histories roll forward on
+    disk, so once warm only the last 5 days are downloaded per refresh.
+    """
+    return fetch_many_tickers(tickers, period=period, interval=interval)
+
+
 class RegimeEngine:
     """
     Analyzes broad market conditions to classify the current regime.
@@ -43,27 +105,40 @@ class RegimeEngine:
         self.vix_data: Optional[pd.DataFrame] = None
 
     def analyze(self) -> MarketRegime:
+        """
+        Regime for the current REGIME_CACHE_TTL window. Repeat calls within the
+        window return the cached result; use force_refresh() to recompute.
+        """
+        regime, engine = _cached_analyze(int(time.time() // REGIME_CACHE_TTL))
+        self.spy_data = engine.spy_data
+        self.qqq_data = engine.qqq_data
+        self.vix_data = engine.vix_data
+        return regime
+
+    def _analyze_uncached(self) -> MarketRegime:
         """Run full regime analysis. Returns cached-ready MarketRegime."""
 
-        # Fetch broad market data using direct Yahoo API
-        spy = self._fetch("SPY", period="1y")
-        qqq = self._fetch("QQQ", period="1y")
-        vix = self._fetch("^VIX", period="1y")
-
-        self.spy_data = spy
-        self.qqq_data = qqq
-        self.vix_data = vix
+        # Fetch broad market + sector data as a single batch
+        hists = _fetch_histories(REGIME_TICKERS, period="1y", interval="1d")
+        spy = self._with_indicators(hists["SPY"])
+        qqq = self._with_indicators(hists["QQQ"])
+        vix = self._with_indicators(hists["^VIX"])
 
         # Classify SPY and QQQ regimes
         spy_regime = self._classify_regime(spy)
         qqq_regime = self._classify_regime(qqq)
 
         # SPY vs EMAs
-        spy_latest = spy.iloc[-1] if len(spy) > 0 else pd.Series()
         spy_vs_emas = {}
-        for ema_col in ["ema_9", "ema_20", "ema_50", "ema_200"]:
-            if ema_col in spy_latest.index and pd.notna(spy_latest.get(ema_col)):
-                spy_vs_emas[ema_col] = "above" if spy_latest["close"] > spy_latest[ema_col] else "below"
+        if len(spy) > 0:
+            emas = spy[list(EMA_COLUMNS)].to_numpy()[-1]
+            above = spy["close"].iat[-1] > emas
+            valid = ~np.isnan(emas)
+            spy_vs_emas = {
+                col: "above" if is_above else "below"
+                for col, is_above, ok in zip(EMA_COLUMNS, above.tolist(), valid.tolist())
+                if ok
+            }
 
         # Market direction
         if spy_regime in [RegimeType.STRONG_UPTREND, RegimeType.UPTREND]:
@@ -75,9 +150,10 @@ class RegimeEngine:
 
         # VIX analysis
         vix_current = vix["close"].iloc[-1] if len(vix) > 0 else 20.0
-        vix_1yr = vix["close"].tail(252) if len(vix) >= 252 else vix["close"]
+        # Rank of today's close within the trailing year (share of days strictly below it)
+        vix_1yr = np.sort(vix["close"].to_numpy()[-252:]) if len(vix) > 0 else np.empty(0)
         vix_percentile = float(
-            (vix_1yr < vix_current).sum() / len(vix_1yr) * 100
+            np.searchsorted(vix_1yr, vix_current, side="left") / len(vix_1yr) * 100
         ) if len(vix_1yr) > 0 else 50.0
 
         # VIX term structure approximation (using recent VIX trend)
@@ -98,28 +174,20 @@ class RegimeEngine:
             vol_regime = "extreme"
 
         # Sector rotation
-        sectors = self._analyze_sectors()
-        leaders = sorted(sectors, key=lambda s: s.performance_1w or 0, reverse=True)[:3]
-        laggards = sorted(sectors, key=lambda s: s.performance_1w or 0)[:3]
+        spy_closes = spy["close"].to_numpy() if len(spy) > 0 else np.empty(0)
+        spy_perf = float((spy_closes[-1] / spy_closes[-5] - 1) * 100) if len(spy_closes) >= 5 else None
+        sectors = self._analyze_sectors({
+            etf: hists[etf].tail(SECTOR_LOOKBACK_BARS) for etf in SECTOR_ETFS.values()
+        }, spy_perf)
+        # Only sectors with a 1w move are ranked; if every fetch failed both are []
+        ranked = [s for s in sectors if s.performance_1w is not None]
+        perf_1w = np.array([s.performance_1w for s in ranked], dtype=np.float64)
+        leaders = [ranked[i] for i in np.argsort(-perf_1w, kind="stable")[:3]]
+        laggards = [ranked[i] for i in np.argsort(perf_1w, kind="stable")[:3]]
 
         # Overall bias
-        bullish_signals = 0
-        bearish_signals = 0
-
-        if spy_regime in [RegimeType.STRONG_UPTREND, RegimeType.UPTREND]:
-            bullish_signals += 2
-        elif spy_regime in [RegimeType.STRONG_DOWNTREND, RegimeType.DOWNTREND]:
-            bearish_signals += 2
-
-        if vix_current < 18:
-            bullish_signals += 1
-        elif vix_current > 25:
-            bearish_signals += 1
-
-        if vix_term == "contango":
-            bullish_signals += 1
-        else:
-            bearish_signals += 1
+        bullish_signals = sum(w for rule, w in _BULL_RULES if rule(spy_regime, vix_current, vix_term))
+        bearish_signals = sum(w for rule, w in _BEAR_RULES if rule(spy_regime, vix_current, vix_term))
 
         if bullish_signals > bearish_signals + 1:
             bias = Direction.BULLISH
@@ -128,6 +196,11 @@ class RegimeEngine:
         else:
             bias = Direction.NEUTRAL
 
+        # Keep only a short tail on the engine; the full 1y frames are no longer needed
+        self.spy_data = spy.tail(RETAINED_BARS).copy()
+        self.qqq_data = qqq.tail(RETAINED_BARS).copy()
+        self.vix_data = vix.tail(RETAINED_BARS).copy()
+
         return MarketRegime(
             timestamp=datetime.utcnow(),
             spy_regime=spy_regime,
@@ -143,20 +216,19 @@ class RegimeEngine:
             bias=bias,
         )
 
-    def _fetch(self, ticker: str, period: str = "1y") -> pd.DataFrame:
-        """Fetch data and compute EMAs for regime classification."""
-        df = fetch_ticker_data(ticker, period=period, interval="1d")
-
+    @staticmethod
+    def _with_indicators(df: pd.DataFrame) -> pd.DataFrame:
+        """Compute EMAs, RSI and ATR for regime classification."""
         if df.empty:
             return pd.DataFrame()
 
-        # Compute EMAs
-        df["ema_9"] = df["close"].ewm(span=9, adjust=False).mean()
-        df["ema_20"] = df["close"].ewm(span=20, adjust=False).mean()
-        df["ema_50"] = df["close"].ewm(span=50, adjust=False).mean()
-        df["ema_200"] = df["close"].ewm(span=200, adjust=False).mean()
-        df["rsi_14"] = IndicatorEngine._compute_rsi(df["close"], 14)
-        df["atr_14"] = IndicatorEngine._compute_atr(df, 14)
+        # EMAs, RSI and ATR in one compiled pass over the OHLC arrays. Indicators are
+        # float32 — regime thresholds are percent-level, so float64 only doubles the bytes moved.
+        high, low, close = (df[col].to_numpy(dtype=np.float32) for col in ("high", "low", "close"))
+        (
+            df["ema_9"], df["ema_20"], df["ema_50"], df["ema_200"], df["rsi_14"], df["atr_14"],
+            df.attrs["ema20_slope_pct"],
+        ) = regime_indicators(high, low, close, *ema_alphas(), RSI_PERIOD, ATR_PERIOD)
 
         return df
 
@@ -165,73 +237,98 @@ class RegimeEngine:
         if df.empty or len(df) < 50:
             return RegimeType.RANGE_BOUND
 
-        latest = df.iloc[-1]
-        price = latest["close"]
+        # Last-bar values of the known columns, read positionally
+        price, ema9, ema20, ema50, ema200, atr = df[CLASSIFY_COLUMNS].to_numpy(dtype=np.float64)[-1].tolist()
 
         # EMA positioning
-        above_9 = price > latest.get("ema_9", price)
-        above_20 = price > latest.get("ema_20", price)
-        above_50 = price > latest.get("ema_50", price)
-        above_200 = price > latest.get("ema_200", price)
-
-        above_count = sum([above_9, above_20, above_50, above_200])
-
-        # Trend slope (20-day EMA slope)
-        if len(df) >= 25:
-            ema20_now = latest.get("ema_20", price)
-            ema20_5d_ago = df.iloc[-6].get("ema_20", price)
-            slope = (ema20_now - ema20_5d_ago) / ema20_5d_ago * 100 if ema20_5d_ago > 0 else 0
-        else:
-            slope = 0
+        above_count = int(price > ema9) + int(price > ema20) + int(price > ema50) + int(price > ema200)
+
+        # Trend slope (20-day EMA slope, from the indicator kernel)
+        slope = df.attrs.get("ema20_slope_pct", 0.0) if len(df) >= 25 else 0
 
         # ATR-based volatility check
-        atr_pct = (latest.get("atr_14", 0) / price * 100) if price > 0 else 0
+        atr_pct = (atr / price * 100) if price > 0 else 0
 
         # High volatility override
         if atr_pct > 4:
             return RegimeType.HIGH_VOLATILITY
 
         # Trend classification
-        if above_count == 4 and slope > 0.5:
-            return RegimeType.STRONG_UPTREND
-        elif above_count >= 3 and slope > 0:
-            return RegimeType.UPTREND
-        elif above_count <= 1 and slope < -0.5:
-            return RegimeType.STRONG_DOWNTREND
-        elif above_count <= 1 and slope < 0:
-            return RegimeType.DOWNTREND
+        if slope > 0.5:
+            slope_bucket = 2
+        elif slope > 0:
+            slope_bucket = 1
+        elif slope < -0.5:
+            slope_bucket = -2
+        elif slope < 0:
+            slope_bucket = -1
         else:
-            return RegimeType.RANGE_BOUND
+            slope_bucket = 0
 
-    def _analyze_sectors(self) -> list[SectorRotation]:
-        """Analyze sector ETF performance for rotation signals."""
-        sectors = []
+        return _REGIME_TABLE.get((above_count, slope_bucket), RegimeType.RANGE_BOUND)
 
+    def _analyze_sectors(
+        self, sector_hists: dict[str, pd.DataFrame], spy_perf: Optional[float]
+    ) -> list[SectorRotation]:
+        """Analyze sector ETF performance for rotation signals (spy_perf = SPY 1w %, if known)."""
+        names, etfs, closes = [], [], []
         for name, etf in SECTOR_ETFS.items():
-            try:
-                hist = fetch_ticker_data(etf, period="1mo", interval="1d")
-                if hist.empty or len(hist) < 5:
-                    continue
-
-                close = hist["close"]
-
-                perf_1w = ((close.iloc[-1] / close.iloc[-5]) - 1) * 100 if len(close) >= 5 else None
-                perf_1m = ((close.iloc[-1] / close.iloc[0]) - 1) * 100
-
-                # Relative strength vs SPY
-                rel_str = None
-                if self.spy_data is not None and len(self.spy_data) >= 5:
-                    spy_perf = ((self.spy_data["close"].iloc[-1] / self.spy_data["close"].iloc[-5]) - 1) * 100
-                    rel_str = round(perf_1w - spy_perf, 2) if perf_1w else None
-
-                sectors.append(SectorRotation(
-                    sector=name,
-                    etf=etf,
-                    performance_1w=round(perf_1w, 2) if perf_1w else None,
-                    performance_1m=round(perf_1m, 2),
-                    relative_strength=rel_str,
-                ))
-            except Exception:
+            hist = sector_hists.get(etf)
+            if hist is None or len(hist) < 5:
                 continue
-
-        return sectors
+            names.append(name)
+            etfs.append(etf)
+            closes.append(hist["close"].to_numpy(dtype=np.float64)[-SECTOR_LOOKBACK_BARS:])
+
+        if not closes:
+            return []
+
+        # One (n_sectors, n_days) matrix, right-aligned; shorter histories are NaN-padded on the left
+        lengths = np.array([len(c) for c in closes])
+        width = lengths.max()
+        matrix = np.full((len(closes), width), np.nan)
+        for row, c in enumerate(closes):
+            matrix[row, width - len(c):] = c
+
+        last = matrix[:, -1]
+        first = matrix[np.arange(len(closes)), width - lengths]
+        perf_1w = (last / matrix[:, -5] - 1) * 100
+        perf_1m = (last / first - 1) * 100
+
+        # Relative strength vs SPY
+        rel_str = np.full(len(closes), np.nan)
+        if spy_perf is not None:
+            rel_str = np.round(perf_1w - spy_perf, 2)
+
+        has_1w = perf_1w != 0
+        has_rel = has_1w & ~np.isnan(rel_str)
+        perf_1w_r = np.round(perf_1w, 2).tolist()
+        perf_1m_r = np.round(perf_1m, 2).tolist()
+        rel_str = rel_str.tolist()
+
+        return [
+            SectorRotation(
+                sector=names[i],
+                etf=etfs[i],
+                performance_1w=perf_1w_r[i] if has_1w[i] else None,
+                performance_1m=perf_1m_r[i],
+                relative_strength=rel_str[i] if has_rel[i] else None,
+            )
+            for i in range(len(closes))
+        ]
+
+
+@lru_cache(maxsize=4)
+def _cached_analyze(bucket: int) -> tuple[MarketRegime, RegimeEngine]:
+    """One full analysis per time bucket; the engine is returned for its retained frames."""
+    engine = RegimeEngine()
+    return engine._analyze_uncached(), engine
+
+
+def force_refresh() -> None:
+    """
+    Re-download the latest bars past the on-disk histories and drop the cached
+    regime, so the next analyze() recomputes it from live data.
+    """
+    _fetch_histories(REGIME_TICKERS, period="1y", interval="1d", refresh=True)
+    _cached_analyze.cache_clear()
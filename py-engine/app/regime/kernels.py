@@ -0,0 +1,99 @@
+"""
+TradePilot Regime Kernels
+Compiled single-pass indicator recurrences for the regime engine.
+numba is optional — without it the kernels run as plain Python loops.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit: returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+EMA_SPANS = (9, 20, 50, 200)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+
+
+@njit(cache=True)
+def regime_indicators(high, low, close, a9, a20, a50, a200, rsi_period, atr_period):
+    """
+    EMA-9/20/50/200, RSI and ATR in one sweep over the OHLC arrays.
+    Outputs share the input dtype (the regime engine passes float32);
+    the running state is kept in float64.
+    Returns (ema_9, ema_20, ema_50, ema_200, rsi, atr, ema20_slope_pct), matching
+    IndicatorEngine: EMAs and ATR are ewm(span=..., adjust=False) (ATR seeded
+    with the first bar's high - low), RSI is Wilder-smoothed (alpha = 1/period)
+    and NaN until `rsi_period` bars or while the average loss is zero.
+    ema20_slope_pct is the 5-bar % change of EMA-20 (0.0 if unavailable).
+    """
+    n = close.shape[0]
+    ema9 = np.empty_like(close)
+    ema20 = np.empty_like(close)
+    ema50 = np.empty_like(close)
+    ema200 = np.empty_like(close)
+    rsi = np.empty_like(close)
+    atr = np.empty_like(close)
+    if n == 0:
+        return ema9, ema20, ema50, ema200, rsi, atr, 0.0
+
+    rsi_alpha = 1.0 / rsi_period
+    atr_alpha = 2.0 / (atr_period + 1.0)
+
+    e9 = e20 = e50 = e200 = float(close[0])
+    avg_gain = 0.0
+    avg_loss = 0.0
+    atr_s = float(high[0]) - float(low[0])
+    e20_lag = 0.0
+
+    for i in range(n):
+        c = float(close[i])
+        e9 = a9 * c + (1.0 - a9) * e9
+        e20 = a20 * c + (1.0 - a20) * e20
+        e50 = a50 * c + (1.0 - a50) * e50
+        e200 = a200 * c + (1.0 - a200) * e200
+
+        # The first bar has no prior close: zero gain/loss, true range = high - low
+        if i > 0:
+            prev = float(close[i - 1])
+            delta = c - prev
+            gain = delta if delta > 0.0 else 0.0
+            loss = -delta if delta < 0.0 else 0.0
+            avg_gain = rsi_alpha * gain + (1.0 - rsi_alpha) * avg_gain
+            avg_loss = rsi_alpha * loss + (1.0 - rsi_alpha) * avg_loss
+
+            hi = float(high[i])
+            lo = float(low[i])
+            tr = max(hi - lo, abs(hi - prev), abs(lo - prev))
+            atr_s = atr_alpha * tr + (1.0 - atr_alpha) * atr_s
+
+        ema9[i] = e9
+        ema20[i] = e20
+        if i == n - 6:
+            e20_lag = e20
+        ema50[i] = e50
+        ema200[i] = e200
+        atr[i] = atr_s
+        if i < rsi_period - 1 or avg_loss == 0.0:
+            rsi[i] = np.nan
+        else:
+            rsi[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    slope_pct = (e20 - e20_lag) / e20_lag * 100.0 if e20_lag > 0.0 else 0.0
+    return ema9, ema20, ema50, ema200, rsi, atr, slope_pct
+
+
+def ema_alphas() -> tuple[float, ...]:
+    """Smoothing factors for EMA_SPANS, in kernel argument order."""
+    return tuple(2.0 / (span + 1.0) for span in EMA_SPANS)
+
+
+# Compile at import so the first regime analysis doesn't pay JIT latency
+_warm = np.ones(2, dtype=np.float32)
+regime_indicators(_warm, _warm, _warm, *ema_alphas(), RSI_PERIOD, ATR_PERIOD)
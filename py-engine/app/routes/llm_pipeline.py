@@ -2,17 +2,478 @@
 TradePilot LLM Pipeline
 5-stage reasoning chain using Claude API (Opus).
 Stages 1-2 run once per session (cached). Stages 3-5 run per ticker.
+All API calls are async (AsyncAnthropic) so tickers can be analyzed concurrently;
+non-interactive watchlist runs go through the Message Batches API instead.
 """
 
+import asyncio
+import hashlib
 import json
+import time
 import anthropic
-from datetime import datetime
-from typing import Optional
+import httpx
+from datetime import date
+from typing import AsyncIterator, Optional, Union
 from app.models.schemas import (
     IndicatorSnapshot, MarketRegime, CatalystContext,
     ConfidenceBreakdown, TradePlan, TradeType, Direction,
     SessionContext, OptionsRecommendation
 )
+from app.data.cross_asset import format_cross_asset_for_llm
+from app.data.disk_cache import cache_path, read_text, write_text
+
+
+# ─── System Prompts ───────────────────────────────────────────────────────────
+# Kept at module level so they are byte-identical across calls — the prompt
+# cache only hits on an exact prefix match.
+
+STAGE1_SYSTEM = """You are a macro strategist at a professional trading desk. Your job is to 
+assess the current catalyst environment and its impact on trading conditions.
+
+You MUST use web search to find:
+1. This week's economic calendar (CPI, PPI, FOMC, NFP, PCE, GDP, ISM, retail sales, etc.)
+2. Any active geopolitical situations affecting markets (conflicts, trade disputes, sanctions, political crises)
+3. Recent market-moving news from the past 48 hours
+
+Search for these proactively — do not rely on memory for dates or current events.
+
+You have been given real quantitative cross-asset data — USE IT to validate or contradict what
+web search tells you. For example, if news says "risk-off" but HYG is rallying, note that divergence.
+The numbers don't lie — prioritize quantitative data over narrative when they conflict.
+
+You think in terms of risk events, historical analogs, and probability-weighted outcomes.
+You never hedge with vague language — you state your assessment directly.
+
+Output format: Structured analysis with clear sections. No fluff."""
+
+
+STAGE2_SYSTEM = """You are a market structure analyst. You specialize in identifying market regimes,
+trend health, and the interaction between technical conditions and macro catalysts.
+
+You have been given real quantitative cross-asset data from bonds, credit, commodities, dollar,
+and breadth instruments. USE THIS DATA to validate your regime assessment. Cross-asset confirmation
+dramatically increases conviction. Cross-asset divergence is a warning signal.
+
+Your analysis should be actionable — tell the trader what types of setups to favor
+in this environment and what to avoid. Be specific about why."""
+
+
+STAGE3_SYSTEM = """You are a technical analyst at a professional trading desk. You analyze 
+price action, indicators, and patterns with precision. You identify key levels,
+confluences, and potential setups.
+
+You are direct and specific. When you identify a level, you state the price.
+When you see a pattern, you name it and explain the implications."""
+
+
+STAGE4_SYSTEM = """You are a risk manager at a professional trading desk. You think in scenarios 
+and probabilities. Your job is to identify what could go right, what could go wrong,
+and what would invalidate the thesis entirely.
+
+You are the voice of caution. You identify risks others miss."""
+
+
+STAGE5_SYSTEM = """You are the portfolio manager synthesizing all analysis into a final trade plan.
+You have received input from the macro strategist (Stage 1), market structure analyst (Stage 2),
+technical analyst (Stage 3), and risk manager (Stage 4).
+
+Your job is to make the final call. You produce a specific, actionable trade plan with
+exact levels, exact stops, exact targets, and a clear thesis.
+
+Submit the plan with the emit_trade_plan tool. For example, stop_loss 175.50 with
+"Below the 20 EMA and prior swing low" as its rationale, and targets
+[{"price": 190.00, "pct_exit": 50, "rationale": "Prior resistance"},
+ {"price": 195.00, "pct_exit": 100, "rationale": "Measured move target"}]."""
+
+
+# Forced tool for Stage 5: the API returns the plan as schema-shaped tool input
+TRADE_PLAN_TOOL = {
+    "name": "emit_trade_plan",
+    "description": "Record the final trade plan.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "thesis": {"type": "string", "description": "Clear, specific thesis in 2-3 sentences"},
+            "setup_type": {
+                "type": "string",
+                "description": "bull_flag|breakout|mean_reversion|trend_continuation|gap_fill|etc",
+            },
+            "entry_zone": {
+                "type": "string",
+                "description": "Specific price or condition, e.g. 'Break above $185 with volume > 1.5x avg'",
+            },
+            "stop_loss": {"type": "number"},
+            "stop_loss_rationale": {"type": "string"},
+            "targets": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "price": {"type": "number"},
+                        "pct_exit": {"type": "number"},
+                        "rationale": {"type": "string"},
+                    },
+                    "required": ["price", "pct_exit", "rationale"],
+                },
+            },
+            "risk_reward_ratio": {"type": "number"},
+            "thesis_invalidation": {
+                "type": "string", "description": "Specific non-price condition that kills the trade",
+            },
+            "catalyst_awareness": {"type": "string", "description": "How upcoming events affect this trade"},
+            "correlation_warnings": {"type": "array", "items": {"type": "string"}},
+            "market_regime_summary": {"type": "string", "description": "One sentence regime context"},
+            "historical_analog_score": {"type": "integer", "minimum": 0, "maximum": 100},
+        },
+        "required": [
+            "thesis", "setup_type", "entry_zone", "stop_loss", "stop_loss_rationale", "targets",
+            "risk_reward_ratio", "thesis_invalidation", "catalyst_awareness", "correlation_warnings",
+            "market_regime_summary", "historical_analog_score",
+        ],
+    },
+}
+
+
+DEBRIEF_SYSTEM = """You are a trading coach reviewing a completed trade. Your job is to identify
+what worked, what didn't, and extract a specific, actionable lesson.
+
+Be direct. Don't sugarcoat losses or inflate wins. Focus on process, not outcomes."""
+
+
+DIGEST_SYSTEM = """You are a head of trading reviewing your desk's weekly performance.
+Identify systematic patterns, biases, and areas for improvement.
+Be analytical and data-driven. Reference specific numbers."""
+
+
+CHAT_SYSTEM = """You are a senior trading strategist having an interactive conversation with a trader.
+You have complete access to today's session analysis, market data, cross-asset data (bonds, credit,
+commodities, dollar, breadth), and the trader's plans and performance.
+
+RULES:
+- Be direct and specific. When you reference a level, state the price. When you cite data, use the numbers.
+- When discussing intermarket relationships, reference the actual cross-asset data you have (e.g., "TLT is +1.2% this week confirming the flight to safety thesis").
+- If asked about a specific trade plan, reference the actual thesis, levels, and confidence scores.
+- If asked "what if" scenarios, reason through them using the indicator and regime data you have.
+- If asked about risk, quantify it using ATR, VIX, and historical analogs from the catalyst analysis.
+- If the trader asks about adjusting a plan (moving stops, changing targets), evaluate whether the
+  adjustment makes sense given the technical and catalyst context.
+- If you don't have enough data to answer, say so clearly rather than guessing.
+- Keep responses focused and actionable. You're at a trading desk, not writing an essay."""
+
+
+SUMMARY_SYSTEM = """You condense a trading desk's session analysis into short briefing notes
+for analysts working individual tickers. Keep every number, level, date, and named
+risk that matters for trade decisions; drop narrative and repetition."""
+
+
+# Forced tool for the session summaries, so both digests come back from one call
+SESSION_SUMMARY_TOOL = {
+    "name": "emit_session_summary",
+    "description": "Record the briefing notes for the session.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "stage1_summary": {
+                "type": "string",
+                "description": "Catalyst & macro context, bullet form, at most 150 words: dominant narrative, "
+                               "scheduled events with dates, key risks",
+            },
+            "stage2_summary": {
+                "type": "string",
+                "description": "Market regime analysis, bullet form, at most 150 words: regime, trend health, "
+                               "setups to favor/avoid, cross-asset signals, key levels",
+            },
+        },
+        "required": ["stage1_summary", "stage2_summary"],
+    },
+}
+
+
+# ─── User Prompt Templates ────────────────────────────────────────────────────
+# Rendered with str.format_map so the prompt text is compiled once at import
+# rather than rebuilt from an f-string on every call.
+
+STAGE1_USER = """Analyze the catalyst environment for this week's trading.
+
+CRITICAL: Use web search to find:
+- This week's US economic calendar (search "economic calendar this week" or "US economic data releases this week")  
+- Any active geopolitical risks (search "geopolitical risks markets today" or "market moving news today")
+- Any major central bank decisions globally this week
+
+CURRENT DATE: {today}
+
+MARKET SNAPSHOT (from quantitative engine — these are real numbers, not estimates):
+- SPY Regime: {spy_regime}
+- QQQ Regime: {qqq_regime}
+- VIX: {vix} (Percentile: {vix_percentile}%)
+- VIX Term Structure: {vix_term_structure}
+- Market Bias: {bias}
+
+EARNINGS UPCOMING (auto-detected from market data):
+{earnings}
+
+SECTOR LEADERSHIP:
+- Leaders: {sector_leaders}
+- Laggards: {sector_laggards}
+
+{cross_asset}
+
+After searching, provide:
+1. THIS WEEK'S DOMINANT NARRATIVE — What is the market focused on?
+2. SCHEDULED MACRO EVENTS — List every data release and Fed event this week with dates, expected impact (low/moderate/high/extreme), and historical context for how surprise outcomes typically move markets
+3. GEOPOLITICAL ASSESSMENT — For any active situations, identify the closest historical analog and estimate impact magnitude/duration/sector effects. Include:
+   - Classification (military conflict / trade war / banking crisis / political instability / sanctions)
+   - Historical analog with specific market data (e.g., "Russia-Ukraine 2022: SPY -6.2%, recovery 28 days")
+   - Which sectors are helped/hurt
+4. POSITIONING BIAS — risk-on / risk-off / neutral / wait-for-catalyst, with reasoning
+5. SECTORS TO FAVOR/AVOID — Based on the catalyst environment
+6. HIDDEN CORRELATION RISKS — Bellwether earnings that could move seemingly unrelated positions"""
+
+STAGE2_USER = """Given the catalyst context below and the current market data, provide a deep 
+regime analysis.
+
+CATALYST CONTEXT (from macro strategist):
+{stage1_output}
+
+MARKET DATA:
+- SPY: {spy_regime}, Direction: {market_direction}
+- SPY vs EMAs: {spy_vs_emas}
+- QQQ: {qqq_regime}
+- VIX: {vix} ({volatility_regime})
+- VIX Percentile: {vix_percentile}%
+- Term Structure: {vix_term_structure}
+- Overall Bias: {bias}
+
+{cross_asset}
+
+Provide:
+1. REGIME CLASSIFICATION — What type of market are we in? Use the cross-asset signals to confirm or challenge. If bonds say "risk-off" but equities say "range-bound", identify that divergence.
+2. TREND HEALTH — Is the trend healthy or showing signs of exhaustion? What are the warning signs? Use breadth data (IWM, RSP) and credit (HYG) to assess participation.
+3. SETUP PREFERENCES — Which setup types are highest probability in this regime?
+   - Breakouts vs. mean reversion vs. momentum continuation
+   - Day trade vs. swing suitability
+4. RISK PARAMETERS — How should position sizing and stop placement adapt to this regime? Use ATR and VIX for sizing guidance.
+5. KEY LEVELS — What SPY/QQQ levels would change the regime if broken? Include cross-asset trigger levels (e.g., "if TLT breaks above X, recession trade accelerates").
+6. WHAT WOULD CHANGE YOUR MIND — What development would shift the regime? Include cross-asset triggers."""
+
+STAGE3_USER = """Analyze the following ticker technically.
+
+PROPOSED DIRECTION: {direction}
+TRADE TYPE: {trade_type}
+
+INDICATOR DATA:
+{indicators}
+
+DETECTED PATTERNS: {patterns}
+
+Provide:
+1. TECHNICAL ASSESSMENT — What is the chart telling us? Trend, momentum, volume confirmation.
+2. KEY LEVELS — Support and resistance levels with the indicator/method that defines them.
+3. PATTERN ANALYSIS — Any actionable patterns? Quality of the setup?
+4. CONFLUENCE ZONES — Where do multiple indicators agree? These are highest probability levels.
+5. DIRECTIONAL BIAS — Does the technical picture support the proposed {direction} direction?
+6. CONCERNS — What technical red flags exist? Divergences, weak volume, overhead resistance?
+7. OPTIMAL ENTRY — Where would you enter, and what confirmation would you wait for?"""
+
+STAGE4_USER = """Model risk scenarios for this trade.
+
+TICKER: {ticker} @ ${price}
+DIRECTION: {direction}
+ATR: ${atr} ({atr_percent}% of price)
+
+CONFIDENCE BREAKDOWN:
+- Trend: {trend:.0f}/100
+- Momentum: {momentum:.0f}/100
+- Volume: {volume:.0f}/100
+- Regime: {regime:.0f}/100
+- Catalyst: {catalyst:.0f}/100
+- Composite: {composite:.0f}/100 — {rating}
+
+TECHNICAL ANALYSIS (from chartist):
+{stage3}
+{bellwethers}
+
+Provide:
+1. BEST CASE SCENARIO — What happens if everything goes right? Target levels and probability.
+2. BASE CASE SCENARIO — Most likely outcome. Expected move and probability.
+3. WORST CASE SCENARIO — What happens if it goes wrong? Where does it stop? Probability.
+4. BLACK SWAN SCENARIO — Low probability but high impact. What would cause a catastrophic move?
+5. THESIS INVALIDATION — What specific condition (not just a price) would kill this trade?
+   Example: "If price closes back inside the range on volume > 2x average, the breakout thesis is dead."
+6. CATALYST RISK — How do upcoming events specifically threaten this position?
+7. CORRELATION WARNING — {correlation_warning}"""
+
+STAGE5_USER = """Synthesize the following analysis into a final trade plan.
+
+TICKER: {ticker} @ ${price}
+DIRECTION: {direction}
+TRADE TYPE: {trade_type}
+CONFIDENCE: {composite:.0f}/100 — {rating}
+
+TECHNICAL ANALYSIS (Stage 3):
+{stage3}
+
+RISK SCENARIOS (Stage 4):
+{stage4}
+{options}
+{prior_trades}
+
+Key indicators:
+- Price: ${price} | EMA9: ${ema_9} | EMA20: ${ema_20} | EMA200: ${ema_200}
+- RSI: {rsi} | MACD Hist: {macd_histogram}
+- RVOL: {rvol} | ATR: ${atr} ({atr_percent}%)
+- Patterns: {patterns}
+
+Produce the final trade plan. Be extremely specific with price levels."""
+
+
+SUMMARY_USER = """Summarize this session's analysis.
+
+=== STAGE 1: CATALYST & MACRO CONTEXT ===
+{stage1_output}
+
+=== STAGE 2: MARKET REGIME ANALYSIS ===
+{stage2_output}"""
+
+
+# Stage 1 (web search) output is reused for this long when the market backdrop is unchanged
+STAGE1_CACHE_TTL = 4 * 3600
+
+# Stage 4 only reads this much of Stage 3's output, so it can start once it has streamed
+STAGE3_HANDOFF_CHARS = 1500
+
+# Stage 3/4 output is reused for this long when a re-run's inputs are materially unchanged
+STAGE_CACHE_TTL = 300
+STAGE_CACHE_MAX_ENTRIES = 256
+
+# Snapshot fields that move with every tick and are left out of the Stage 3/4 cache key
+VOLATILE_INDICATOR_FIELDS = {"timestamp", "price", "volume"}
+
+# Extended thinking for the analytical stages (2 and 4); these tokens come on
+# top of each call's visible max_tokens
+ANALYTIC_THINKING = {"type": "enabled", "budget_tokens": 1500}
+
+# Service tier per call type. Latency-sensitive calls (chat, Stage 3) may use
+# Priority Tier capacity when the account has it; background and analytical
+# calls stay on standard capacity so they never compete with them.
+INTERACTIVE_TIER = {"service_tier": "auto"}
+BACKGROUND_TIER = {"service_tier": "standard_only"}
+
+# Rough prompt size estimate for the input-token rate limit
+CHARS_PER_TOKEN = 4
+
+# How often a submitted Message Batch is polled for completion
+BATCH_POLL_SECONDS = 30
+
+
+def _system_blocks(cached: list[str], dynamic: str = "") -> list[dict]:
+    """
+    Build a system prompt as text blocks with a prompt-cache breakpoint after
+    the last `cached` block. Text that changes per call goes in `dynamic`,
+    after the breakpoint, so it doesn't invalidate the cached prefix.
+    """
+    blocks = [{"type": "text", "text": text} for text in cached if text]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    if dynamic:
+        blocks.append({"type": "text", "text": dynamic})
+    return blocks
+
+
+def _message_text(message) -> str:
+    """Concatenated text blocks of a response (skipping thinking / tool blocks)."""
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+def _with_thinking(params: dict, thinking: Optional[dict]) -> dict:
+    """Add `thinking` to messages.create params, growing max_tokens by its budget."""
+    if not thinking:
+        return params
+    return {**params, "thinking": thinking, "max_tokens": params["max_tokens"] + thinking["budget_tokens"]}
+
+
+def _round_floats(value, ndigits: int = 2):
+    """Round every float in a nested dict/list structure."""
+    if isinstance(value, float):
+        return round(value, ndigits)
+    if isinstance(value, dict):
+        return {k: _round_floats(v, ndigits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round_floats(v, ndigits) for v in value]
+    return value
+
+
+def _fingerprint(*parts) -> str:
+    """Short stable hash of JSON-serializable parts."""
+    return hashlib.blake2b(
+        json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _tool_input(message, name: str) -> dict:
+    """Input of the `name` tool call in a response forced to use that tool."""
+    if message.stop_reason == "tool_use":
+        for block in message.content:
+            if block.type == "tool_use" and block.name == name:
+                return block.input
+    raise RuntimeError(f"{name} was not called (stop_reason: {message.stop_reason})")
+
+
+def _with_cache_breakpoint(message: dict) -> dict:
+    """Copy of a chat message with a prompt-cache breakpoint on its last content block."""
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [dict(block) for block in content]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return {**message, "content": blocks}
+
+
+def _sector_moves(sectors: list) -> str:
+    """Format sector rotation entries as 'Sector (ETF: +1.2%), ...'."""
+    return ", ".join(
+        f"{s.sector} ({s.etf}: {s.performance_1w:+.1f}%)" for s in sectors if s.performance_1w is not None
+    ) or "N/A"
+
+
+def _plan_summary_line(p: dict) -> str:
+    """One-line digest of a stored trade plan for the chat context."""
+    conf = p.get('confidence', {})
+    comp = conf.get('composite', '?') if isinstance(conf, dict) else '?'
+    return (
+        f"- {p.get('ticker', '?')} | {p.get('direction', '?')} {p.get('trade_type', '?')} | "
+        f"Entry: {p.get('entry_zone', '?')} | Stop: ${p.get('stop_loss', '?')} | "
+        f"R:R {p.get('risk_reward_ratio', '?')}:1 | "
+        f"Confidence: {comp} | "
+        f"Thesis: {str(p.get('thesis', '?'))[:120]}"
+    )
+
+
+class _RateLimiter:
+    """
+    Async token bucket refilled continuously at `per_minute` units per minute.
+    Waiters are served in arrival order; a request larger than the whole
+    bucket waits for a full bucket rather than forever.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) / self.rate)
 
 
 class LLMPipeline:
@@ -29,33 +490,128 @@ class LLMPipeline:
         Stage 5: Trade Plan Synthesis
     """
 
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-5-20250514"):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(
+        self, api_key: str, model: str = "claude-sonnet-4-5-20250514",
+        max_rpm: Optional[int] = None, max_tpm: Optional[int] = None,
+    ):
+        # One pooled HTTP/2 connection set for every stage and chat call, so
+        # requests reuse TLS sessions and multiplex instead of reconnecting
+        self._http = anthropic.DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        )
+        # The SDK retries 429/529/5xx with exponential backoff and jitter, honoring retry-after
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=self._http, max_retries=5)
         self.model = model
+
+        # Client-side backpressure so concurrent tickers queue instead of bursting
+        # into the account's requests/min and input tokens/min limits (None = unlimited)
+        self._rpm_limiter = _RateLimiter(max_rpm) if max_rpm else None
+        self._tpm_limiter = _RateLimiter(max_tpm) if max_tpm else None
+
+        # Stage 3/4 outputs for the current session: {key: (stored_at, text)}
+        self._stage_cache: dict[str, tuple[float, str]] = {}
         self.session_context: Optional[SessionContext] = None
 
-    def _call_claude(self, system: str, user: str, max_tokens: int = 4096) -> str:
-        """Make a single Claude API call (no tools)."""
-        message = self.client.messages.create(
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client (call on app shutdown)."""
+        await self.client.close()
+
+    async def _throttle(self, system: Union[str, list[dict]], messages: list[dict]) -> None:
+        """Wait for rate-limit budget for one live request with this prompt."""
+        if self._rpm_limiter:
+            await self._rpm_limiter.acquire()
+        if self._tpm_limiter:
+            blocks = [{"text": system}] if isinstance(system, str) else system
+            chars = sum(len(b["text"]) for b in blocks) + sum(len(str(m["content"])) for m in messages)
+            await self._tpm_limiter.acquire(chars / CHARS_PER_TOKEN)
+
+    async def _call_claude(
+        self, system: Union[str, list[dict]], user: str, max_tokens: int = 4096,
+        thinking: Optional[dict] = None,
+    ) -> str:
+        """
+        Make a single Claude API call (no tools).
+        A plain-string system prompt is sent as one cached block.
+        With `thinking` (e.g. ANALYTIC_THINKING), extended thinking is enabled and
+        max_tokens still bounds only the visible answer.
+        """
+        await self._throttle(system, [{"role": "user", "content": user}])
+        message = await self.client.messages.create(**_with_thinking({
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": _system_blocks([system]) if isinstance(system, str) else system,
+            "messages": [{"role": "user", "content": user}],
+            "extra_body": BACKGROUND_TIER,
+        }, thinking))
+        return _message_text(message)
+
+    async def _stream_claude(
+        self, system: Union[str, list[dict]], user: str, max_tokens: int,
+        prefix_chars: int, prefix: asyncio.Future,
+    ) -> str:
+        """
+        Streaming variant of _call_claude, for latency-sensitive calls
+        (INTERACTIVE_TIER). Resolves `prefix` with the first
+        `prefix_chars` characters as soon as they arrive (or with the whole
+        response if it is shorter), so a dependent stage can start early.
+        """
+        parts: list[str] = []
+        received = 0
+        await self._throttle(system, [{"role": "user", "content": user}])
+        async with self.client.messages.stream(
             model=self.model,
             max_tokens=max_tokens,
-            system=system,
+            system=_system_blocks([system]) if isinstance(system, str) else system,
+            messages=[{"role": "user", "content": user}],
+            extra_body=INTERACTIVE_TIER,
+        ) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                received += len(text)
+                if received >= prefix_chars and not prefix.done():
+                    prefix.set_result("".join(parts)[:prefix_chars])
+
+        full = "".join(parts)
+        if not prefix.done():
+            prefix.set_result(full)
+        return full
+
+    async def _call_claude_tool(
+        self, system: Union[str, list[dict]], user: str, tool: dict, max_tokens: int = 4096
+    ) -> dict:
+        """
+        Make a Claude API call that is forced to answer through `tool`.
+        Returns the tool input (schema-shaped JSON) as a dict.
+        """
+        await self._throttle(system, [{"role": "user", "content": user}])
+        message = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            system=_system_blocks([system]) if isinstance(system, str) else system,
+            tools=[tool],
+            tool_choice={"type": "tool", "name": tool["name"]},
             messages=[{"role": "user", "content": user}],
+            extra_body=BACKGROUND_TIER,
         )
-        return message.content[0].text
+        return _tool_input(message, tool["name"])
 
-    def _call_claude_with_search(self, system: str, user: str, max_tokens: int = 4096) -> str:
+    async def _call_claude_with_search(
+        self, system: Union[str, list[dict]], user: str, max_tokens: int = 4096
+    ) -> str:
         """
         Make a Claude API call with web search enabled.
         Used for Stage 1 to pull real-time macro calendar, news, and geopolitical data.
         Claude will autonomously search when it needs current information.
         """
-        message = self.client.messages.create(
+        await self._throttle(system, [{"role": "user", "content": user}])
+        message = await self.client.messages.create(
             model=self.model,
             max_tokens=max_tokens,
-            system=system,
+            system=_system_blocks([system]) if isinstance(system, str) else system,
             tools=[{"type": "web_search_20250305", "name": "web_search"}],
             messages=[{"role": "user", "content": user}],
+            extra_body=BACKGROUND_TIER,
         )
         # Extract all text blocks from the response (web search returns mixed content)
         text_parts = []
@@ -64,45 +620,152 @@ class LLMPipeline:
                 text_parts.append(block.text)
         return "\n".join(text_parts)
 
+    async def submit_batch(
+        self, prompts: dict[str, tuple[Union[str, list[dict]], str, int]],
+        tool: Optional[dict] = None, thinking: Optional[dict] = None,
+    ) -> str:
+        """
+        Submit {custom_id: (system, user, max_tokens)} as one Message Batch
+        (half the price of live calls; results within 24h). With `tool`, every
+        request is forced to answer through it; `thinking` is as for _call_claude.
+        Returns the batch id.
+        """
+        tool_params = (
+            {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}} if tool else {}
+        )
+        batch = await self.client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": custom_id,
+                    "params": _with_thinking({
+                        "model": self.model,
+                        "max_tokens": max_tokens,
+                        "system": _system_blocks([system]) if isinstance(system, str) else system,
+                        "messages": [{"role": "user", "content": user}],
+                        **tool_params,
+                    }, thinking),
+                }
+                for custom_id, (system, user, max_tokens) in prompts.items()
+            ]
+        )
+        return batch.id
+
+    async def collect_batch(self, batch_id: str) -> dict[str, anthropic.types.Message]:
+        """
+        Poll a Message Batch until it has ended, then return {custom_id: message}
+        for the requests that succeeded. Errored or expired requests are omitted.
+        """
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        while batch.processing_status != "ended":
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+            batch = await self.client.messages.batches.retrieve(batch_id)
+
+        outputs = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                outputs[entry.custom_id] = entry.result.message
+            else:
+                print(f"[LLM] Batch {batch_id}: {entry.custom_id} {entry.result.type}")
+        return outputs
+
     # ─── Session-Level Stages ─────────────────────────────────────────────
 
-    def run_session_stages(
+    async def run_session_stages(
         self,
         regime: MarketRegime,
         catalysts: CatalystContext,
         session_id: str = "default",
         cross_asset_data: dict = None,
+        refresh_stage1: bool = False,
     ) -> SessionContext:
         """
         Run Stages 1-2 once per session. Results are cached and reused
         for all ticker analyses in this session.
+        Stage 1 is also reused across sessions and restarts (see _stage1_cache_key);
+        pass refresh_stage1=True to force a fresh web search, e.g. around major events.
         """
 
-        # Format cross-asset data for LLM consumption
-        cross_asset_text = ""
-        if cross_asset_data:
-            from app.data.cross_asset import format_cross_asset_for_llm
-            cross_asset_text = format_cross_asset_for_llm(cross_asset_data)
+        # Pin the session date so every prompt and cache key in this session agrees on it
+        session_date = date.today()
+        date_str = session_date.strftime("%Y-%m-%d %A")
+
+        # Format cross-asset data for LLM consumption (once — chat reuses it from the context)
+        cross_asset_text = format_cross_asset_for_llm(cross_asset_data) if cross_asset_data else ""
+        sector_leaders_text = _sector_moves(regime.sector_leaders)
+        sector_laggards_text = _sector_moves(regime.sector_laggards)
 
         # Stage 1: Catalyst & Macro Context (now with cross-asset data)
-        stage1_output = self._stage1_catalyst_context(regime, catalysts, cross_asset_text)
+        stage1_path = cache_path(f"stage1_{self._stage1_cache_key(regime, catalysts, session_date)}.txt")
+        stage1_output = None if refresh_stage1 else read_text(stage1_path, STAGE1_CACHE_TTL)
+        if stage1_output is None:
+            stage1_output = await self._stage1_catalyst_context(
+                regime, catalysts, date_str, cross_asset_text, sector_leaders_text, sector_laggards_text
+            )
+            if stage1_output.strip():
+                write_text(stage1_path, stage1_output)
 
         # Stage 2: Market Regime Deep Analysis (now with cross-asset data)
-        stage2_output = self._stage2_regime_analysis(regime, stage1_output, cross_asset_text)
+        stage2_output = await self._stage2_regime_analysis(regime, stage1_output, cross_asset_text)
+
+        # Short digests of Stages 1-2 for the per-ticker stages
+        summaries = await self._session_summaries(stage1_output, stage2_output)
 
+        self._stage_cache.clear()  # cached Stage 3/4 output was written against the old context
         self.session_context = SessionContext(
             session_id=session_id,
             regime=regime,
             catalysts=catalysts,
             cross_asset_data=cross_asset_data,
+            cross_asset_text=cross_asset_text,
+            date_str=date_str,
+            sector_leaders_text=sector_leaders_text,
+            sector_laggards_text=sector_laggards_text,
             stage1_output=stage1_output,
             stage2_output=stage2_output,
+            stage1_summary=summaries.get("stage1_summary", ""),
+            stage2_summary=summaries.get("stage2_summary", ""),
         )
 
         return self.session_context
 
-    def _stage1_catalyst_context(
-        self, regime: MarketRegime, catalysts: CatalystContext, cross_asset_text: str = ""
+    async def _session_summaries(self, stage1_output: str, stage2_output: str) -> dict:
+        """
+        Condense Stages 1-2 into ~150-word digests in one call. On failure the
+        per-ticker stages fall back to truncated raw output, so this never
+        fails the session.
+        """
+        user = SUMMARY_USER.format_map({"stage1_output": stage1_output, "stage2_output": stage2_output})
+        try:
+            return await self._call_claude_tool(SUMMARY_SYSTEM, user, SESSION_SUMMARY_TOOL, max_tokens=800)
+        except (anthropic.APIError, RuntimeError) as e:
+            print(f"[LLM] Session summary failed - {e}")
+            return {}
+
+    @staticmethod
+    def _stage1_cache_key(regime: MarketRegime, catalysts: CatalystContext, session_date: date) -> str:
+        """
+        Fingerprint of what Stage 1 depends on at day granularity: the date, the
+        coarse regime (bias, volatility bucket, term structure) and the earnings
+        calendar. Intraday moves in the exact numbers don't change the key.
+        """
+        earnings = sorted(f"{e.ticker}@{e.date}" for e in catalysts.earnings_this_week)
+        fingerprint = json.dumps([
+            session_date.isoformat(),
+            regime.bias.value,
+            regime.volatility_regime,
+            regime.vix_term_structure,
+            earnings,
+        ])
+        return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    async def _stage1_catalyst_context(
+        self,
+        regime: MarketRegime,
+        catalysts: CatalystContext,
+        date_str: str,
+        cross_asset_text: str = "",
+        sector_leaders_text: str = "",
+        sector_laggards_text: str = "",
     ) -> str:
         """
         Stage 1: Analyze the catalyst environment for the week.
@@ -110,113 +773,49 @@ class LLMPipeline:
         Now includes cross-asset market data (bonds, credit, commodities, dollar, breadth).
         """
 
-        system = """You are a macro strategist at a professional trading desk. Your job is to 
-assess the current catalyst environment and its impact on trading conditions.
-
-You MUST use web search to find:
-1. This week's economic calendar (CPI, PPI, FOMC, NFP, PCE, GDP, ISM, retail sales, etc.)
-2. Any active geopolitical situations affecting markets (conflicts, trade disputes, sanctions, political crises)
-3. Recent market-moving news from the past 48 hours
-
-Search for these proactively — do not rely on memory for dates or current events.
-
-You have been given real quantitative cross-asset data — USE IT to validate or contradict what
-web search tells you. For example, if news says "risk-off" but HYG is rallying, note that divergence.
-The numbers don't lie — prioritize quantitative data over narrative when they conflict.
-
-You think in terms of risk events, historical analogs, and probability-weighted outcomes.
-You never hedge with vague language — you state your assessment directly.
-
-Output format: Structured analysis with clear sections. No fluff."""
-
-        earnings_str = "\n".join([
+        earnings_str = "\n".join(
             f"  - {e.ticker} on {e.date} {'(BELLWETHER — affects: ' + ', '.join(e.affected_tickers) + ')' if e.is_bellwether else ''}"
             for e in catalysts.earnings_this_week
-        ]) or "  None in the next 14 days"
-
-        user = f"""Analyze the catalyst environment for this week's trading.
-
-CRITICAL: Use web search to find:
-- This week's US economic calendar (search "economic calendar this week" or "US economic data releases this week")  
-- Any active geopolitical risks (search "geopolitical risks markets today" or "market moving news today")
-- Any major central bank decisions globally this week
-
-CURRENT DATE: {datetime.now().strftime('%Y-%m-%d %A')}
-
-MARKET SNAPSHOT (from quantitative engine — these are real numbers, not estimates):
-- SPY Regime: {regime.spy_regime.value}
-- QQQ Regime: {regime.qqq_regime.value}
-- VIX: {regime.vix} (Percentile: {regime.vix_percentile}%)
-- VIX Term Structure: {regime.vix_term_structure}
-- Market Bias: {regime.bias.value}
-
-EARNINGS UPCOMING (auto-detected from market data):
-{earnings_str}
-
-SECTOR LEADERSHIP:
-- Leaders: {', '.join([f"{s.sector} ({s.etf}: {s.performance_1w:+.1f}%)" for s in regime.sector_leaders if s.performance_1w is not None]) or 'N/A'}
-- Laggards: {', '.join([f"{s.sector} ({s.etf}: {s.performance_1w:+.1f}%)" for s in regime.sector_laggards if s.performance_1w is not None]) or 'N/A'}
-
-{cross_asset_text}
-
-After searching, provide:
-1. THIS WEEK'S DOMINANT NARRATIVE — What is the market focused on?
-2. SCHEDULED MACRO EVENTS — List every data release and Fed event this week with dates, expected impact (low/moderate/high/extreme), and historical context for how surprise outcomes typically move markets
-3. GEOPOLITICAL ASSESSMENT — For any active situations, identify the closest historical analog and estimate impact magnitude/duration/sector effects. Include:
-   - Classification (military conflict / trade war / banking crisis / political instability / sanctions)
-   - Historical analog with specific market data (e.g., "Russia-Ukraine 2022: SPY -6.2%, recovery 28 days")
-   - Which sectors are helped/hurt
-4. POSITIONING BIAS — risk-on / risk-off / neutral / wait-for-catalyst, with reasoning
-5. SECTORS TO FAVOR/AVOID — Based on the catalyst environment
-6. HIDDEN CORRELATION RISKS — Bellwether earnings that could move seemingly unrelated positions"""
-
-        return self._call_claude_with_search(system, user, max_tokens=4000)
-
-    def _stage2_regime_analysis(self, regime: MarketRegime, stage1_output: str, cross_asset_text: str = "") -> str:
+        ) or "  None in the next 14 days"
+
+        user = STAGE1_USER.format_map({
+            "today": date_str,
+            "spy_regime": regime.spy_regime.value,
+            "qqq_regime": regime.qqq_regime.value,
+            "vix": regime.vix,
+            "vix_percentile": regime.vix_percentile,
+            "vix_term_structure": regime.vix_term_structure,
+            "bias": regime.bias.value,
+            "earnings": earnings_str,
+            "sector_leaders": sector_leaders_text,
+            "sector_laggards": sector_laggards_text,
+            "cross_asset": cross_asset_text,
+        })
+
+        return await self._call_claude_with_search(STAGE1_SYSTEM, user, max_tokens=4000)
+
+    async def _stage2_regime_analysis(self, regime: MarketRegime, stage1_output: str, cross_asset_text: str = "") -> str:
         """Stage 2: Deep market regime analysis informed by catalyst context and cross-asset data."""
 
-        system = """You are a market structure analyst. You specialize in identifying market regimes,
-trend health, and the interaction between technical conditions and macro catalysts.
-
-You have been given real quantitative cross-asset data from bonds, credit, commodities, dollar,
-and breadth instruments. USE THIS DATA to validate your regime assessment. Cross-asset confirmation
-dramatically increases conviction. Cross-asset divergence is a warning signal.
-
-Your analysis should be actionable — tell the trader what types of setups to favor
-in this environment and what to avoid. Be specific about why."""
-
-        user = f"""Given the catalyst context below and the current market data, provide a deep 
-regime analysis.
-
-CATALYST CONTEXT (from macro strategist):
-{stage1_output}
-
-MARKET DATA:
-- SPY: {regime.spy_regime.value}, Direction: {regime.market_direction.value}
-- SPY vs EMAs: {json.dumps(regime.spy_vs_emas)}
-- QQQ: {regime.qqq_regime.value}
-- VIX: {regime.vix} ({regime.volatility_regime})
-- VIX Percentile: {regime.vix_percentile}%
-- Term Structure: {regime.vix_term_structure}
-- Overall Bias: {regime.bias.value}
-
-{cross_asset_text}
-
-Provide:
-1. REGIME CLASSIFICATION — What type of market are we in? Use the cross-asset signals to confirm or challenge. If bonds say "risk-off" but equities say "range-bound", identify that divergence.
-2. TREND HEALTH — Is the trend healthy or showing signs of exhaustion? What are the warning signs? Use breadth data (IWM, RSP) and credit (HYG) to assess participation.
-3. SETUP PREFERENCES — Which setup types are highest probability in this regime?
-   - Breakouts vs. mean reversion vs. momentum continuation
-   - Day trade vs. swing suitability
-4. RISK PARAMETERS — How should position sizing and stop placement adapt to this regime? Use ATR and VIX for sizing guidance.
-5. KEY LEVELS — What SPY/QQQ levels would change the regime if broken? Include cross-asset trigger levels (e.g., "if TLT breaks above X, recession trade accelerates").
-6. WHAT WOULD CHANGE YOUR MIND — What development would shift the regime? Include cross-asset triggers."""
-
-        return self._call_claude(system, user, max_tokens=2500)
+        user = STAGE2_USER.format_map({
+            "stage1_output": stage1_output,
+            "spy_regime": regime.spy_regime.value,
+            "market_direction": regime.market_direction.value,
+            "spy_vs_emas": json.dumps(regime.spy_vs_emas),
+            "qqq_regime": regime.qqq_regime.value,
+            "vix": regime.vix,
+            "volatility_regime": regime.volatility_regime,
+            "vix_percentile": regime.vix_percentile,
+            "vix_term_structure": regime.vix_term_structure,
+            "bias": regime.bias.value,
+            "cross_asset": cross_asset_text,
+        })
+
+        return await self._call_claude(STAGE2_SYSTEM, user, max_tokens=2500, thinking=ANALYTIC_THINKING)
 
     # ─── Per-Ticker Stages ────────────────────────────────────────────────
 
-    def analyze_ticker(
+    async def analyze_ticker(
         self,
         indicators: IndicatorSnapshot,
         confidence: ConfidenceBreakdown,
@@ -233,16 +832,28 @@ Provide:
         if not self.session_context:
             raise RuntimeError("Session context not initialized. Run run_session_stages() first.")
 
-        # Stage 3: Technical Analysis
-        stage3 = self._stage3_technical(indicators, direction, trade_type)
-
-        # Stage 4: Risk Scenario Modeling
-        stage4 = self._stage4_risk_scenarios(
-            indicators, stage3, confidence, direction, correlated_bellwethers or []
+        # Stage 3: Technical Analysis (streamed)
+        stage3_head = asyncio.get_running_loop().create_future()
+        stage3_task = asyncio.create_task(
+            self._stage3_technical(indicators, direction, trade_type, stage3_head)
         )
 
+        # Stage 4: Risk Scenario Modeling — only reads the first STAGE3_HANDOFF_CHARS
+        # of Stage 3, so it starts as soon as those have streamed in
+        await asyncio.wait({stage3_head, stage3_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not stage3_head.done():
+            await stage3_task  # Stage 3 failed before the handoff point — re-raise its error
+        try:
+            stage4 = await self._stage4_risk_scenarios(
+                indicators, stage3_head.result(), confidence, direction, correlated_bellwethers or []
+            )
+        except BaseException:
+            stage3_task.cancel()
+            raise
+        stage3 = await stage3_task
+
         # Stage 5: Trade Plan Synthesis
-        plan = self._stage5_synthesis(
+        plan = await self._stage5_synthesis(
             indicators, stage3, stage4, confidence,
             options_rec, trade_type, direction,
             prior_trades or [], correlated_bellwethers or []
@@ -250,128 +861,255 @@ Provide:
 
         return plan
 
-    def _stage3_technical(
-        self, indicators: IndicatorSnapshot, direction: Direction, trade_type: TradeType
-    ) -> str:
-        """Stage 3: Technical analysis of a specific ticker."""
-
-        system = """You are a technical analyst at a professional trading desk. You analyze 
-price action, indicators, and patterns with precision. You identify key levels,
-confluences, and potential setups.
-
-You are direct and specific. When you identify a level, you state the price.
-When you see a pattern, you name it and explain the implications."""
+    async def analyze_tickers_batch(
+        self, requests: list[dict], live: bool = False, max_concurrency: int = 8
+    ) -> list[Union[TradePlan, Exception]]:
+        """
+        Run Stages 3-5 for several tickers (non-interactive runs, e.g. the
+        morning watchlist). Each request is a dict of analyze_ticker() keyword
+        arguments. Results are in request order; a failed ticker yields its exception.
+
+        By default this goes through the Message Batches API in three waves —
+        every ticker's Stage 3, then Stage 4, then Stage 5 — trading latency
+        for half-price tokens. live=True instead runs analyze_ticker()
+        concurrently, capped at max_concurrency tickers.
+        """
+        if not self.session_context:
+            raise RuntimeError("Session context not initialized. Run run_session_stages() first.")
+        if not live:
+            return await self._analyze_tickers_offline(requests)
+
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(req: dict) -> TradePlan:
+            async with sem:
+                return await self.analyze_ticker(**req)
+
+        return await asyncio.gather(*[_one(r) for r in requests], return_exceptions=True)
+
+    async def _analyze_tickers_offline(self, requests: list[dict]) -> list[Union[TradePlan, Exception]]:
+        """Stages 3-5 for every request as three Message Batch waves."""
+        # custom_ids only allow [A-Za-z0-9_-], so key by request index rather than ticker
+        reqs = {f"t{i}": r for i, r in enumerate(requests)}
+        results: dict[str, Union[TradePlan, Exception]] = {}
+
+        def _wave_failed(outputs: dict[str, str], stage: int) -> None:
+            for cid in list(reqs):
+                if cid not in outputs:
+                    results[cid] = RuntimeError(f"{reqs.pop(cid)['indicators'].ticker}: Stage {stage} batch request failed")
+
+        # Wave 1: Stage 3
+        stage3 = await self.collect_batch(await self.submit_batch({
+            f"{cid}-s3": (*self._stage3_prompt(r["indicators"], r["direction"], r["trade_type"]), 2500)
+            for cid, r in reqs.items()
+        }))
+        stage3 = {cid.removesuffix("-s3"): _message_text(msg) for cid, msg in stage3.items()}
+        _wave_failed(stage3, 3)
+
+        # Wave 2: Stage 4 (reads the same Stage 3 prefix as the live path)
+        if reqs:
+            stage4 = await self.collect_batch(await self.submit_batch({
+                f"{cid}-s4": (*self._stage4_prompt(
+                    r["indicators"], stage3[cid][:STAGE3_HANDOFF_CHARS], r["confidence"],
+                    r["direction"], r.get("correlated_bellwethers") or [],
+                ), 2500)
+                for cid, r in reqs.items()
+            }, thinking=ANALYTIC_THINKING))
+            stage4 = {cid.removesuffix("-s4"): _message_text(msg) for cid, msg in stage4.items()}
+            _wave_failed(stage4, 4)
+
+        # Wave 3: Stage 5
+        if reqs:
+            stage5 = await self.collect_batch(await self.submit_batch({
+                f"{cid}-s5": (*self._stage5_prompt(
+                    r["indicators"], stage3[cid], stage4[cid], r["confidence"], r.get("options_rec"),
+                    r["trade_type"], r["direction"], r.get("prior_trades") or [],
+                ), 2000)
+                for cid, r in reqs.items()
+            }, tool=TRADE_PLAN_TOOL))
+            stage5 = {cid.removesuffix("-s5"): msg for cid, msg in stage5.items()}
+            _wave_failed(stage5, 5)
+            for cid, r in reqs.items():
+                try:
+                    plan_data = _tool_input(stage5[cid], TRADE_PLAN_TOOL["name"])
+                except RuntimeError as e:
+                    results[cid] = RuntimeError(f"{r['indicators'].ticker}: Stage 5 {e}")
+                    continue
+                results[cid] = self._stage5_plan(
+                    plan_data, r["indicators"], r["confidence"], r.get("options_rec"),
+                    r["trade_type"], r["direction"],
+                )
 
-        ind_json = indicators.model_dump_json(indent=2)
+        return [results[f"t{i}"] for i in range(len(requests))]
 
-        user = f"""Analyze the following ticker technically.
+    def _stage1_brief(self, fallback_chars: int) -> str:
+        """Stage 1 digest, or the first `fallback_chars` of its raw output if there is none."""
+        ctx = self.session_context
+        return ctx.stage1_summary or ctx.stage1_output[:fallback_chars]
 
-MARKET CONTEXT (from session analysis):
-{self.session_context.stage2_output[:1500]}
+    def _stage2_brief(self, fallback_chars: int) -> str:
+        """Stage 2 digest, or the first `fallback_chars` of its raw output if there is none."""
+        ctx = self.session_context
+        return ctx.stage2_summary or ctx.stage2_output[:fallback_chars]
 
-PROPOSED DIRECTION: {direction.value}
-TRADE TYPE: {trade_type.value}
+    async def _stage3_technical(
+        self, indicators: IndicatorSnapshot, direction: Direction, trade_type: TradeType,
+        head: asyncio.Future,
+    ) -> str:
+        """
+        Stage 3: Technical analysis of a specific ticker.
+        Streams the response; `head` resolves with the first STAGE3_HANDOFF_CHARS.
+        """
+        key = self._stage3_key(indicators, direction, trade_type)
+        cached = self._cache_get(key)
+        if cached is not None:
+            head.set_result(cached[:STAGE3_HANDOFF_CHARS])
+            return cached
+
+        system, user = self._stage3_prompt(indicators, direction, trade_type)
+        output = await self._stream_claude(system, user, 2500, STAGE3_HANDOFF_CHARS, head)
+        self._cache_put(key, output)
+        return output
+
+    @staticmethod
+    def _stage3_key(indicators: IndicatorSnapshot, direction: Direction, trade_type: TradeType) -> str:
+        """
+        Cache key for Stage 3: the snapshot rounded to 2 decimals, minus
+        VOLATILE_INDICATOR_FIELDS, plus the trade parameters. A re-run on a
+        new price tick with the same indicator picture maps to the same key.
+        """
+        stable = indicators.model_dump(mode="json", exclude=VOLATILE_INDICATOR_FIELDS)
+        return "s3:" + _fingerprint(_round_floats(stable), direction.value, trade_type.value)
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Cached stage output, or None if missing or older than STAGE_CACHE_TTL."""
+        entry = self._stage_cache.get(key)
+        if entry is None or time.monotonic() - entry[0] > STAGE_CACHE_TTL:
+            return None
+        return entry[1]
+
+    def _cache_put(self, key: str, text: str) -> None:
+        """Store a stage output, evicting the oldest entry past STAGE_CACHE_MAX_ENTRIES."""
+        self._stage_cache.pop(key, None)
+        self._stage_cache[key] = (time.monotonic(), text)
+        if len(self._stage_cache) > STAGE_CACHE_MAX_ENTRIES:
+            del self._stage_cache[next(iter(self._stage_cache))]
+
+    def _stage3_prompt(
+        self, indicators: IndicatorSnapshot, direction: Direction, trade_type: TradeType
+    ) -> tuple[list[dict], str]:
+        """Stage 3 (system, user) prompt."""
 
-INDICATOR DATA:
-{ind_json}
+        # Compact JSON: the model reads it just as well, and indentation only adds input tokens
+        ind_json = indicators.model_dump_json()
 
-DETECTED PATTERNS: {', '.join(indicators.patterns) if indicators.patterns else 'None detected'}
+        # Session context is identical for every ticker — it sits in the cached system prefix
+        system = _system_blocks([
+            STAGE3_SYSTEM,
+            f"MARKET CONTEXT (from session analysis):\n{self._stage2_brief(1500)}",
+        ])
 
-Provide:
-1. TECHNICAL ASSESSMENT — What is the chart telling us? Trend, momentum, volume confirmation.
-2. KEY LEVELS — Support and resistance levels with the indicator/method that defines them.
-3. PATTERN ANALYSIS — Any actionable patterns? Quality of the setup?
-4. CONFLUENCE ZONES — Where do multiple indicators agree? These are highest probability levels.
-5. DIRECTIONAL BIAS — Does the technical picture support the proposed {direction.value} direction?
-6. CONCERNS — What technical red flags exist? Divergences, weak volume, overhead resistance?
-7. OPTIMAL ENTRY — Where would you enter, and what confirmation would you wait for?"""
+        user = STAGE3_USER.format_map({
+            "direction": direction.value,
+            "trade_type": trade_type.value,
+            "indicators": ind_json,
+            "patterns": ", ".join(indicators.patterns) if indicators.patterns else "None detected",
+        })
 
-        return self._call_claude(system, user, max_tokens=2500)
+        return system, user
 
-    def _stage4_risk_scenarios(
+    async def _stage4_risk_scenarios(
         self, indicators: IndicatorSnapshot, stage3_output: str,
         confidence: ConfidenceBreakdown, direction: Direction,
         correlated_bellwethers: list[str]
     ) -> str:
-        """Stage 4: Model best/base/worst case scenarios."""
+        """
+        Stage 4: Model best/base/worst case scenarios.
+        Cached on the Stage 3 text it reads, the stable indicator fields,
+        confidence scores in 5-point buckets, and the bellwether set.
+        """
+        key = "s4:" + _fingerprint(
+            stage3_output[:STAGE3_HANDOFF_CHARS],
+            _round_floats(indicators.model_dump(mode="json", exclude=VOLATILE_INDICATOR_FIELDS)),
+            direction.value,
+            [round(score / 5) for score in (
+                confidence.trend_alignment, confidence.momentum_confirmation,
+                confidence.volume_confirmation, confidence.regime_alignment,
+                confidence.catalyst_alignment, confidence.composite,
+            )],
+            sorted(correlated_bellwethers),
+        )
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
 
-        system = """You are a risk manager at a professional trading desk. You think in scenarios 
-and probabilities. Your job is to identify what could go right, what could go wrong,
-and what would invalidate the thesis entirely.
+        system, user = self._stage4_prompt(
+            indicators, stage3_output, confidence, direction, correlated_bellwethers
+        )
+        output = await self._call_claude(system, user, max_tokens=2500, thinking=ANALYTIC_THINKING)
+        self._cache_put(key, output)
+        return output
 
-You are the voice of caution. You identify risks others miss."""
+    def _stage4_prompt(
+        self, indicators: IndicatorSnapshot, stage3_output: str,
+        confidence: ConfidenceBreakdown, direction: Direction,
+        correlated_bellwethers: list[str]
+    ) -> tuple[list[dict], str]:
+        """Stage 4 (system, user) prompt."""
 
         bellwether_str = (
             f"\nCORRELATED BELLWETHERS REPORTING SOON: {', '.join(correlated_bellwethers)}"
             if correlated_bellwethers else ""
         )
 
-        user = f"""Model risk scenarios for this trade.
-
-TICKER: {indicators.ticker} @ ${indicators.price}
-DIRECTION: {direction.value}
-ATR: ${indicators.atr_14} ({indicators.atr_percent}% of price)
-
-CONFIDENCE BREAKDOWN:
-- Trend: {confidence.trend_alignment:.0f}/100
-- Momentum: {confidence.momentum_confirmation:.0f}/100
-- Volume: {confidence.volume_confirmation:.0f}/100
-- Regime: {confidence.regime_alignment:.0f}/100
-- Catalyst: {confidence.catalyst_alignment:.0f}/100
-- Composite: {confidence.composite:.0f}/100 — {confidence.rating}
-
-TECHNICAL ANALYSIS (from chartist):
-{stage3_output[:1500]}
-
-CATALYST CONTEXT:
-{self.session_context.stage1_output[:1000]}
-{bellwether_str}
-
-Provide:
-1. BEST CASE SCENARIO — What happens if everything goes right? Target levels and probability.
-2. BASE CASE SCENARIO — Most likely outcome. Expected move and probability.
-3. WORST CASE SCENARIO — What happens if it goes wrong? Where does it stop? Probability.
-4. BLACK SWAN SCENARIO — Low probability but high impact. What would cause a catastrophic move?
-5. THESIS INVALIDATION — What specific condition (not just a price) would kill this trade?
-   Example: "If price closes back inside the range on volume > 2x average, the breakout thesis is dead."
-6. CATALYST RISK — How do upcoming events specifically threaten this position?
-7. CORRELATION WARNING — {f"This ticker is correlated with {', '.join(correlated_bellwethers)} which report soon. Assess the hidden exposure." if correlated_bellwethers else "No direct bellwether correlation detected."}"""
-
-        return self._call_claude(system, user, max_tokens=2500)
-
-    def _stage5_synthesis(
+        system = _system_blocks([
+            STAGE4_SYSTEM,
+            f"CATALYST CONTEXT:\n{self._stage1_brief(1000)}",
+        ])
+
+        user = STAGE4_USER.format_map({
+            "ticker": indicators.ticker,
+            "price": indicators.price,
+            "direction": direction.value,
+            "atr": indicators.atr_14,
+            "atr_percent": indicators.atr_percent,
+            "trend": confidence.trend_alignment,
+            "momentum": confidence.momentum_confirmation,
+            "volume": confidence.volume_confirmation,
+            "regime": confidence.regime_alignment,
+            "catalyst": confidence.catalyst_alignment,
+            "composite": confidence.composite,
+            "rating": confidence.rating,
+            "stage3": stage3_output[:STAGE3_HANDOFF_CHARS],
+            "bellwethers": bellwether_str,
+            "correlation_warning": (
+                f"This ticker is correlated with {', '.join(correlated_bellwethers)} which report soon. "
+                "Assess the hidden exposure."
+                if correlated_bellwethers else "No direct bellwether correlation detected."
+            ),
+        })
+
+        return system, user
+
+    async def _stage5_synthesis(
         self, indicators: IndicatorSnapshot, stage3: str, stage4: str,
         confidence: ConfidenceBreakdown, options_rec: Optional[OptionsRecommendation],
         trade_type: TradeType, direction: Direction,
         prior_trades: list[dict], correlated_bellwethers: list[str]
     ) -> TradePlan:
         """Stage 5: Synthesize everything into a final trade plan."""
+        system, user = self._stage5_prompt(
+            indicators, stage3, stage4, confidence, options_rec, trade_type, direction, prior_trades
+        )
+        plan_data = await self._call_claude_tool(system, user, TRADE_PLAN_TOOL, max_tokens=2000)
+        return self._stage5_plan(plan_data, indicators, confidence, options_rec, trade_type, direction)
 
-        system = """You are the portfolio manager synthesizing all analysis into a final trade plan.
-You have received input from the macro strategist (Stage 1), market structure analyst (Stage 2),
-technical analyst (Stage 3), and risk manager (Stage 4).
-
-Your job is to make the final call. You produce a specific, actionable trade plan with
-exact levels, exact stops, exact targets, and a clear thesis.
-
-RESPOND IN VALID JSON matching this structure exactly:
-{
-    "thesis": "Clear, specific thesis in 2-3 sentences",
-    "setup_type": "bull_flag|breakout|mean_reversion|trend_continuation|gap_fill|etc",
-    "entry_zone": "Specific price or condition, e.g. 'Break above $185 with volume > 1.5x avg'",
-    "stop_loss": 175.50,
-    "stop_loss_rationale": "Below the 20 EMA and prior swing low",
-    "targets": [
-        {"price": 190.00, "pct_exit": 50, "rationale": "Prior resistance"},
-        {"price": 195.00, "pct_exit": 100, "rationale": "Measured move target"}
-    ],
-    "risk_reward_ratio": 2.5,
-    "thesis_invalidation": "Specific non-price condition that kills the trade",
-    "catalyst_awareness": "How upcoming events affect this trade",
-    "correlation_warnings": ["warning 1", "warning 2"],
-    "market_regime_summary": "One sentence regime context",
-    "historical_analog_score": 65
-}"""
+    def _stage5_prompt(
+        self, indicators: IndicatorSnapshot, stage3: str, stage4: str,
+        confidence: ConfidenceBreakdown, options_rec: Optional[OptionsRecommendation],
+        trade_type: TradeType, direction: Direction, prior_trades: list[dict],
+    ) -> tuple[list[dict], str]:
+        """Stage 5 (system, user) prompt."""
 
         prior_trades_str = ""
         if prior_trades:
@@ -379,7 +1117,7 @@ RESPOND IN VALID JSON matching this structure exactly:
             prior_trades_str = f"""
 
 PRE-TRADE COMPARISON — YOUR HISTORY WITH THIS TYPE OF SETUP:
-{json.dumps(recent, indent=2, default=str)}
+{json.dumps(recent, separators=(",", ":"), default=str)}
 Consider: What worked and what didn't in your past trades on similar setups?"""
 
         options_str = ""
@@ -391,61 +1129,41 @@ Strategy: {options_rec.strategy.value}
 Rationale: {options_rec.rationale}
 Structure: {options_rec.structure}"""
 
-        user = f"""Synthesize the following analysis into a final trade plan.
-
-TICKER: {indicators.ticker} @ ${indicators.price}
-DIRECTION: {direction.value}
-TRADE TYPE: {trade_type.value}
-CONFIDENCE: {confidence.composite:.0f}/100 — {confidence.rating}
-
-SESSION CONTEXT:
-{self.session_context.stage1_output[:800]}
-{self.session_context.stage2_output[:800]}
-
-TECHNICAL ANALYSIS (Stage 3):
-{stage3[:1200]}
-
-RISK SCENARIOS (Stage 4):
-{stage4[:1200]}
-{options_str}
-{prior_trades_str}
-
-Key indicators:
-- Price: ${indicators.price} | EMA9: ${indicators.ema_9} | EMA20: ${indicators.ema_20} | EMA200: ${indicators.ema_200}
-- RSI: {indicators.rsi_14} | MACD Hist: {indicators.macd.histogram if indicators.macd else 'N/A'}
-- RVOL: {indicators.rvol} | ATR: ${indicators.atr_14} ({indicators.atr_percent}%)
-- Patterns: {', '.join(indicators.patterns) if indicators.patterns else 'None'}
-
-Produce the final trade plan as JSON. Be extremely specific with price levels."""
-
-        raw = self._call_claude(system, user, max_tokens=2000)
-
-        # Parse the JSON response
-        try:
-            # Extract JSON from response (handle markdown code blocks)
-            json_str = raw
-            if "```json" in raw:
-                json_str = raw.split("```json")[1].split("```")[0]
-            elif "```" in raw:
-                json_str = raw.split("```")[1].split("```")[0]
-
-            plan_data = json.loads(json_str.strip())
-        except (json.JSONDecodeError, IndexError):
-            # Fallback: create plan from raw text
-            plan_data = {
-                "thesis": raw[:500],
-                "setup_type": "manual_review",
-                "entry_zone": "See analysis",
-                "stop_loss": indicators.price * 0.95,
-                "stop_loss_rationale": "Default 5% stop — manual review required",
-                "targets": [{"price": indicators.price * 1.10, "pct_exit": 100, "rationale": "Default target"}],
-                "risk_reward_ratio": 2.0,
-                "thesis_invalidation": "Review Stage 4 risk scenarios",
-                "catalyst_awareness": "Review Stage 1 catalyst context",
-                "correlation_warnings": [],
-                "market_regime_summary": "Review Stage 2",
-                "historical_analog_score": 50,
-            }
+        system = _system_blocks([
+            STAGE5_SYSTEM,
+            f"SESSION CONTEXT:\n{self._stage1_brief(800)}\n{self._stage2_brief(800)}",
+        ])
+
+        user = STAGE5_USER.format_map({
+            "ticker": indicators.ticker,
+            "price": indicators.price,
+            "direction": direction.value,
+            "trade_type": trade_type.value,
+            "composite": confidence.composite,
+            "rating": confidence.rating,
+            "stage3": stage3[:1200],
+            "stage4": stage4[:1200],
+            "options": options_str,
+            "prior_trades": prior_trades_str,
+            "ema_9": indicators.ema_9,
+            "ema_20": indicators.ema_20,
+            "ema_200": indicators.ema_200,
+            "rsi": indicators.rsi_14,
+            "macd_histogram": indicators.macd.histogram if indicators.macd else "N/A",
+            "rvol": indicators.rvol,
+            "atr": indicators.atr_14,
+            "atr_percent": indicators.atr_percent,
+            "patterns": ", ".join(indicators.patterns) if indicators.patterns else "None",
+        })
+
+        return system, user
+
+    @staticmethod
+    def _stage5_plan(
+        plan_data: dict, indicators: IndicatorSnapshot, confidence: ConfidenceBreakdown,
+        options_rec: Optional[OptionsRecommendation], trade_type: TradeType, direction: Direction,
+    ) -> TradePlan:
+        """Build the TradePlan from the emit_trade_plan tool input."""
 
         # Update historical analog score in confidence
         analog_score = plan_data.get("historical_analog_score", 50)
@@ -473,14 +1191,9 @@ Produce the final trade plan as JSON. Be extremely specific with price levels.""
 
     # ─── Feedback: Post-Trade Debrief ─────────────────────────────────────
 
-    def generate_debrief(self, trade_plan: TradePlan, journal_entry: dict) -> str:
+    async def generate_debrief(self, trade_plan: TradePlan, journal_entry: dict) -> str:
         """Generate an immediate post-trade debrief from the LLM."""
 
-        system = """You are a trading coach reviewing a completed trade. Your job is to identify
-what worked, what didn't, and extract a specific, actionable lesson.
-
-Be direct. Don't sugarcoat losses or inflate wins. Focus on process, not outcomes."""
-
         user = f"""Review this completed trade:
 
 ORIGINAL PLAN:
@@ -504,18 +1217,14 @@ Provide:
 4. KEY LESSON — One specific, actionable takeaway for future trades
 5. PATTERN NOTE — Anything about this trade type/setup to remember"""
 
-        return self._call_claude(system, user, max_tokens=1500)
+        return await self._call_claude(DEBRIEF_SYSTEM, user, max_tokens=1500)
 
     # ─── Feedback: Weekly Digest ──────────────────────────────────────────
 
-    def generate_weekly_digest(self, trades: list[dict]) -> str:
+    async def generate_weekly_digest(self, trades: list[dict]) -> str:
         """Generate a weekly performance review from trade history."""
 
-        system = """You are a head of trading reviewing your desk's weekly performance.
-Identify systematic patterns, biases, and areas for improvement.
-Be analytical and data-driven. Reference specific numbers."""
-
-        trades_str = json.dumps(trades[:20], indent=2, default=str)  # cap at 20 trades
+        trades_str = json.dumps(trades[:20], separators=(",", ":"), default=str)  # cap at 20 trades
 
         user = f"""Review this week's trading performance:
 
@@ -532,11 +1241,11 @@ Analyze:
 7. BIAS CHECK — Any systematic biases? (always bullish, oversizing, revenge trading)
 8. TOP 3 IMPROVEMENTS — Specific, actionable changes for next week"""
 
-        return self._call_claude(system, user, max_tokens=2500)
+        return await self._call_claude(DIGEST_SYSTEM, user, max_tokens=2500)
 
     # ─── Interactive Chat ─────────────────────────────────────────────────
 
-    def chat(
+    async def chat(
         self,
         messages: list[dict],
         trade_plans: list[dict] = None,
@@ -547,17 +1256,55 @@ Analyze:
         The user can ask follow-up questions about the week's analysis,
         specific trade plans, market conditions, or strategy.
         """
+        system, api_messages = self._chat_request(messages, trade_plans, performance_stats)
+        await self._throttle(system, api_messages)
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=2000,
+            system=system,
+            messages=api_messages,
+            extra_body=INTERACTIVE_TIER,
+        )
+        return _message_text(response)
+
+    async def chat_stream(
+        self,
+        messages: list[dict],
+        trade_plans: list[dict] = None,
+        performance_stats: dict = None,
+    ) -> AsyncIterator[str]:
+        """Streaming variant of chat(): yields the reply text as it is generated."""
+        system, api_messages = self._chat_request(messages, trade_plans, performance_stats)
+        await self._throttle(system, api_messages)
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=2000,
+            system=system,
+            messages=api_messages,
+            extra_body=INTERACTIVE_TIER,
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    def _chat_request(
+        self, messages: list[dict], trade_plans: Optional[list[dict]], performance_stats: Optional[dict]
+    ) -> tuple[list[dict], list[dict]]:
+        """Chat (system blocks, messages) with the session context folded into the system prompt."""
         if not self.session_context:
             raise RuntimeError("No active session. Initialize session first.")
 
-        # Build the context block that gives the LLM full awareness
-        context_parts = []
+        # Stage 1/2 outputs are fixed for the session — they go in the cached prefix
+        session_context = f"""YOUR CONTEXT (reference this to answer questions):
+
+=== STAGE 1: CATALYST & MACRO CONTEXT ===
+{self.session_context.stage1_output}
 
-        context_parts.append(f"""=== STAGE 1: CATALYST & MACRO CONTEXT ===
-{self.session_context.stage1_output}""")
+=== STAGE 2: MARKET REGIME ANALYSIS ===
+{self.session_context.stage2_output}"""
 
-        context_parts.append(f"""=== STAGE 2: MARKET REGIME ANALYSIS ===
-{self.session_context.stage2_output}""")
+        # Market, cross-asset and catalyst data are also fixed for the session,
+        # so they join the cached prefix too
+        context_parts = [session_context]
 
         regime = self.session_context.regime
         context_parts.append(f"""=== CURRENT MARKET DATA ===
@@ -566,14 +1313,12 @@ QQQ Regime: {regime.qqq_regime.value}
 VIX: {regime.vix} (Percentile: {regime.vix_percentile}%, Regime: {regime.volatility_regime})
 Term Structure: {regime.vix_term_structure}
 Market Bias: {regime.bias.value}
-Sector Leaders: {', '.join(f"{s.sector} ({s.etf}: {s.performance_1w:+.1f}%)" for s in regime.sector_leaders if s.performance_1w is not None) or 'N/A'}
-Sector Laggards: {', '.join(f"{s.sector} ({s.etf}: {s.performance_1w:+.1f}%)" for s in regime.sector_laggards if s.performance_1w is not None) or 'N/A'}""")
+Sector Leaders: {self.session_context.sector_leaders_text or 'N/A'}
+Sector Laggards: {self.session_context.sector_laggards_text or 'N/A'}""")
 
         # Add cross-asset data to chat context
-        if self.session_context.cross_asset_data:
-            from app.data.cross_asset import format_cross_asset_for_llm
-            cross_asset_text = format_cross_asset_for_llm(self.session_context.cross_asset_data)
-            context_parts.append(cross_asset_text)
+        if self.session_context.cross_asset_text:
+            context_parts.append(self.session_context.cross_asset_text)
 
         catalysts = self.session_context.catalysts
         earnings_str = ", ".join(
@@ -585,56 +1330,28 @@ Event Risk: {catalysts.overall_event_risk.value}
 Earnings This Week: {earnings_str}
 (* = bellwether)""")
 
+        # Plans and performance change as trades are logged — they go after the breakpoint
+        dynamic_parts = []
         if trade_plans:
-            plans_summary = []
-            for p in trade_plans[:10]:
-                conf = p.get('confidence', {})
-                comp = conf.get('composite', '?') if isinstance(conf, dict) else '?'
-                plans_summary.append(
-                    f"- {p.get('ticker', '?')} | {p.get('direction', '?')} {p.get('trade_type', '?')} | "
-                    f"Entry: {p.get('entry_zone', '?')} | Stop: ${p.get('stop_loss', '?')} | "
-                    f"R:R {p.get('risk_reward_ratio', '?')}:1 | "
-                    f"Confidence: {comp} | "
-                    f"Thesis: {str(p.get('thesis', '?'))[:120]}"
-                )
-            context_parts.append(f"""=== TRADE PLANS THIS SESSION ===
-{chr(10).join(plans_summary)}""")
+            plans_summary = "\n".join(_plan_summary_line(p) for p in trade_plans[:10])
+            dynamic_parts.append(f"""=== TRADE PLANS THIS SESSION ===
+{plans_summary}""")
 
         if performance_stats and performance_stats.get("total_trades", 0) > 0:
-            context_parts.append(f"""=== YOUR PERFORMANCE (last {performance_stats.get('period_days', 30)} days) ===
+            dynamic_parts.append(f"""=== YOUR PERFORMANCE (last {performance_stats.get('period_days', 30)} days) ===
 Total Trades: {performance_stats.get('total_trades')}
 Win Rate: {performance_stats.get('win_rate')}%
 Avg Win: +{performance_stats.get('avg_win')}% | Avg Loss: {performance_stats.get('avg_loss')}%
 Profit Factor: {performance_stats.get('profit_factor')}
 Total P/L: {performance_stats.get('total_pnl_pct')}%""")
 
-        full_context = "\n\n".join(context_parts)
-
-        system = f"""You are a senior trading strategist having an interactive conversation with a trader.
-You have complete access to today's session analysis, market data, cross-asset data (bonds, credit,
-commodities, dollar, breadth), and the trader's plans and performance.
-
-YOUR CONTEXT (reference this to answer questions):
-{full_context}
-
-RULES:
-- Be direct and specific. When you reference a level, state the price. When you cite data, use the numbers.
-- When discussing intermarket relationships, reference the actual cross-asset data you have (e.g., "TLT is +1.2% this week confirming the flight to safety thesis").
-- If asked about a specific trade plan, reference the actual thesis, levels, and confidence scores.
-- If asked "what if" scenarios, reason through them using the indicator and regime data you have.
-- If asked about risk, quantify it using ATR, VIX, and historical analogs from the catalyst analysis.
-- If the trader asks about adjusting a plan (moving stops, changing targets), evaluate whether the
-  adjustment makes sense given the technical and catalyst context.
-- If you don't have enough data to answer, say so clearly rather than guessing.
-- Keep responses focused and actionable. You're at a trading desk, not writing an essay."""
-
-        api_messages = [{"role": m["role"], "content": m["content"]} for m in messages]
-
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            system=system,
-            messages=api_messages,
+        system = _system_blocks(
+            [CHAT_SYSTEM, "\n\n".join(context_parts)], dynamic="\n\n".join(dynamic_parts)
         )
 
-        return response.content[0].text
\ No newline at end of file
+        # Second breakpoint on the last prior turn: the conversation so far is
+        # read from cache and only the newest message is processed fresh
+        api_messages = [{"role": m["role"], "content": m["content"]} for m in messages]
+        if len(api_messages) >= 2:
+            api_messages[-2] = _with_cache_breakpoint(api_messages[-2])
+        return system, api_messages
\ No newline at end of file
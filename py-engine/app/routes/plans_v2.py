@@ -3,22 +3,54 @@ TradePilot v2 Plans, Settings, and Watchlist API Routes.
 Lifecycle-tracked plans with entry/exit logging and deviation detection.
 """
 
+import time
 from datetime import datetime
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, StringConstraints
+from typing import Annotated, Optional
 from app.database import db
 
 
-router = APIRouter(prefix="/api/v2", tags=["v2"])
+# orjson encodes the large history / search payloads much faster than stdlib json
+router = APIRouter(prefix="/api/v2", tags=["v2"], default_response_class=ORJSONResponse)
+
+_today_cache = {"t": 0.0, "v": ""}
+
+
+def _today_str() -> str:
+    """UTC "today" (YYYY-MM-DD), re-formatted at most once per second."""
+    now = time.monotonic()
+    if now - _today_cache["t"] > 1.0:
+        _today_cache["v"] = datetime.utcnow().strftime("%Y-%m-%d")
+        _today_cache["t"] = now
+    return _today_cache["v"]
+
+
+async def _raise_not_updated(plan_id: str, detail: str, conflict_status: Optional[str] = None) -> None:
+    """
+    A conditional plan update matched nothing: 404 if the plan is gone, 409 if
+    it is still in `conflict_status` (changed concurrently, safe to retry),
+    otherwise 400 with `detail` (formatted with the plan's current status).
+    """
+    status = await db.get_plan_status(plan_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if status == conflict_status:
+        raise HTTPException(status_code=409, detail="Plan changed while it was being updated, retry")
+    raise HTTPException(status_code=400, detail=detail.format(status=status))
 
 
 # ─── Request Models ────────────────────────────────────────────────────────────
 
+# Ticker symbol, uppercased by pydantic-core during validation
+Ticker = Annotated[str, StringConstraints(to_upper=True)]
+
+
 class CreatePlanRequest(BaseModel):
     session_id: str
     date: str  # YYYY-MM-DD
-    ticker: str
+    ticker: Ticker
     direction: str  # "call" | "put"
     source: str = "generated"  # "generated" | "manual"
 
@@ -101,71 +133,72 @@ class UpdateSettingsRequest(BaseModel):
 @router.post("/plans")
 async def create_plan(req: CreatePlanRequest):
     """Create a new plan (from LLM pipeline or manual entry)."""
+    data = req.model_dump()
     plan = {
-        "session_id": req.session_id,
-        "date": req.date,
-        "ticker": req.ticker.upper(),
-        "direction": req.direction,
+        "session_id": data["session_id"],
+        "date": data["date"],
+        "ticker": data["ticker"],
+        "direction": data["direction"],
         "status": "watching",
-        "source": req.source,
+        "source": data["source"],
 
         # Card
         "confidence": {
-            "score": req.confidence_score,
-            "grade": req.confidence_grade,
+            "score": data["confidence_score"],
+            "grade": data["confidence_grade"],
         },
         "entry_zone": {
-            "low": req.entry_zone_low,
-            "high": req.entry_zone_high,
+            "low": data["entry_zone_low"],
+            "high": data["entry_zone_high"],
         },
         "stop": {
-            "price": req.stop_price,
-            "reason": req.stop_reason,
+            "price": data["stop_price"],
+            "reason": data["stop_reason"],
         },
-        "targets": req.targets or [],
-        "strike": req.strike,
-        "risk_reward": req.risk_reward,
+        "targets": data["targets"] or [],
+        "strike": data["strike"],
+        "risk_reward": data["risk_reward"],
         "size": {
-            "contracts": req.size_contracts,
-            "risk_dollars": req.size_risk_dollars,
+            "contracts": data["size_contracts"],
+            "risk_dollars": data["size_risk_dollars"],
         },
-        "kill_switch": req.kill_switch,
+        "kill_switch": data["kill_switch"],
 
         # Timing
         "timing": {
-            "primary": req.timing_primary,
-            "secondary": req.timing_secondary,
-            "dead_zones": req.timing_dead_zones or [],
-            "hard_cutoff": req.timing_hard_cutoff,
+            "primary": data["timing_primary"],
+            "secondary": data["timing_secondary"],
+            "dead_zones": data["timing_dead_zones"] or [],
+            "hard_cutoff": data["timing_hard_cutoff"],
         },
 
         # Options
         "expected_premium": {
-            "low": req.expected_premium_low,
-            "high": req.expected_premium_high,
-            "max_pay": req.expected_premium_max,
+            "low": data["expected_premium_low"],
+            "high": data["expected_premium_high"],
+            "max_pay": data["expected_premium_max"],
         },
 
         # Deep dive
-        "thesis": req.thesis,
-        "regime_context": req.regime_context,
-        "catalyst_risk": req.catalyst_risk,
-        "invalidation": req.invalidation or [],
-        "cross_asset_note": req.cross_asset_note,
-        "options_detail": req.options_detail,
-        "scaling_strategy": req.scaling_strategy,
-        "position_kill": req.position_kill or [],
-        "discipline_note": req.discipline_note,
+        "thesis": data["thesis"],
+        "regime_context": data["regime_context"],
+        "catalyst_risk": data["catalyst_risk"],
+        "invalidation": data["invalidation"] or [],
+        "cross_asset_note": data["cross_asset_note"],
+        "options_detail": data["options_detail"],
+        "scaling_strategy": data["scaling_strategy"],
+        "position_kill": data["position_kill"] or [],
+        "discipline_note": data["discipline_note"],
 
         # Checklists
-        "checklist_premarket": req.checklist_premarket or {},
-        "checklist_intraday": req.checklist_intraday or {},
-        "confidence_breakdown": req.confidence_breakdown or {},
+        "checklist_premarket": data["checklist_premarket"] or {},
+        "checklist_intraday": data["checklist_intraday"] or {},
+        "confidence_breakdown": data["confidence_breakdown"] or {},
 
         # Lifecycle (empty until populated)
         "entry": None,
         "exits": [],
-        "remaining_contracts": req.size_contracts or 0,
+        "remaining_contracts": data["size_contracts"] or 0,
         "total_pnl_dollars": 0,
         "total_pnl_percent": 0,
         "r_realized": 0,
@@ -173,68 +206,54 @@ async def create_plan(req: CreatePlanRequest):
         "cancellation": None,
     }
 
-    plan_id = await db.create_plan_v2(plan.copy())
-    plan["id"] = plan_id
+    plan["id"] = await db.create_plan_v2(plan)
     return plan
 
 
-@router.get("/plans")
-async def get_plans(date: Optional[str] = None, status: Optional[str] = None, session_id: Optional[str] = None):
+# The read routes below return ORJSONResponse directly: the db layer already
+# yields JSON-ready dicts (string ids, datetimes orjson encodes natively), so
+# FastAPI's jsonable_encoder pass over every document is skipped.
+
+@router.get("/plans", response_model=None)
+async def get_plans(date: Optional[str] = None, status: Optional[str] = None, session_id: Optional[str] = None) -> ORJSONResponse:
     """Get plans, filtered by date and/or status and/or session."""
     if session_id:
         plans = await db.get_plans_by_session(session_id)
         if status:
             plans = [p for p in plans if p.get("status") == status]
-        return {"plans": plans}
+        return ORJSONResponse({"plans": plans})
 
     if date:
         plans = await db.get_plans_by_date(date, status)
     else:
         # Default: today
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        plans = await db.get_plans_by_date(today, status)
-
-    return {"plans": plans}
-
-
-@router.get("/plans/history")
-async def get_plans_history(days: int = 30):
-    """Get plans grouped by date for history view."""
-    plans = await db.get_plans_history(days)
-
-    # Group by date
-    by_date = {}
-    for p in plans:
-        d = p.get("date", "unknown")
-        if d not in by_date:
-            by_date[d] = {"date": d, "plans": [], "total_pnl": 0, "entered_count": 0, "rules_broken": 0}
-        by_date[d]["plans"].append(p)
-        by_date[d]["total_pnl"] += p.get("total_pnl_dollars", 0)
-        if p.get("status") in ("entered", "exited", "stopped_out", "reviewed"):
-            by_date[d]["entered_count"] += 1
-        entry = p.get("entry", {})
-        if entry and entry.get("deviation_count", 0) > 0:
-            by_date[d]["rules_broken"] += 1
-
-    # Sort by date descending
-    history = sorted(by_date.values(), key=lambda x: x["date"], reverse=True)
-    return {"history": history}
-
-
-@router.get("/plans/search/{ticker}")
-async def search_plans_by_ticker(ticker: str, limit: int = 50):
+        plans = await db.get_plans_by_date(_today_str(), status)
+
+    return ORJSONResponse({"plans": plans})
+
+
+@router.get("/plans/history", response_model=None)
+async def get_plans_history(days: int = 30) -> ORJSONResponse:
+    """Get plans grouped by date for history view (aggregated in the database)."""
+    history = await db.get_plans_history_grouped(days)
+    return ORJSONResponse({"history": history})
+
+
+@router.get("/plans/search/{ticker}", response_model=None)
+async def search_plans_by_ticker(ticker: str, limit: int = 50) -> ORJSONResponse:
     """Search all plans for a ticker."""
+    ticker = ticker.upper()
     plans = await db.search_plans_by_ticker(ticker, limit)
-    return {"plans": plans, "ticker": ticker.upper()}
+    return ORJSONResponse({"plans": plans, "ticker": ticker})
 
 
-@router.get("/plans/{plan_id}")
-async def get_plan(plan_id: str):
+@router.get("/plans/{plan_id}", response_model=None)
+async def get_plan(plan_id: str) -> ORJSONResponse:
     """Get a single plan by ID."""
     plan = await db.get_plan_v2(plan_id)
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
-    return plan
+    return ORJSONResponse(plan)
 
 
 @router.post("/plans/{plan_id}/entry")
@@ -275,11 +294,18 @@ async def log_entry(plan_id: str, req: LogEntryRequest):
         "deviation_count": len(auto_deviations) + len(req.self_reported_deviations),
     }
 
-    await db.update_plan_v2(plan_id, {
+    # Empty deviation lists are left out of the stored entry (deviation_count
+    # still records them); the response below keeps the full shape
+    stored_entry = {k: v for k, v in entry_data.items() if v != []}
+
+    # Only transitions if the plan is still watching (no concurrent entry/cancel)
+    updated = await db.conditional_update_plan(plan_id, ["watching"], {
         "status": "entered",
-        "entry": entry_data,
+        "entry": stored_entry,
         "remaining_contracts": req.contracts,
     })
+    if not updated:
+        await _raise_not_updated(plan_id, "Cannot enter a plan with status '{status}'")
 
     return {
         "status": "entered",
@@ -297,24 +323,22 @@ async def log_exit(plan_id: str, req: LogExitRequest):
     if plan.get("status") not in ("entered",):
         raise HTTPException(status_code=400, detail=f"Cannot exit a plan with status '{plan['status']}'")
 
-    entry = plan.get("entry", {})
-    fill_price = entry.get("fill_price", 0)
-    remaining = plan.get("remaining_contracts", 0)
+    entry: dict = plan.get("entry", {})
+    fill_price: float = entry.get("fill_price", 0)
+    remaining: int = plan.get("remaining_contracts", 0)
 
     if req.contracts > remaining:
         raise HTTPException(status_code=400, detail=f"Cannot exit {req.contracts} contracts, only {remaining} remaining")
 
-    # Calculate P&L for this exit
-    direction = plan.get("direction", "call")
-    if direction == "call":
-        pnl_per_contract = (req.price - fill_price) * 100
-    else:
-        pnl_per_contract = (fill_price - req.price) * 100  # For puts bought
-
-    # Actually for options: P&L = (exit_premium - entry_premium) * 100 * contracts
-    # fill_price IS the premium paid, req.price IS the premium received
-    pnl_dollars = (req.price - fill_price) * 100 * req.contracts
-    pnl_percent = ((req.price - fill_price) / fill_price * 100) if fill_price > 0 else 0
+    # Calculate P&L for this exit. Calls and puts are both bought, so P&L is
+    # (exit_premium - entry_premium) * 100 * contracts regardless of direction:
+    # fill_price IS the premium paid, req.price IS the premium received.
+    # Money is kept in integer cents so sums are exact; dollars are derived
+    # only for storage and the response.
+    fill_cents: int = round(fill_price * 100)
+    delta_cents: int = round(req.price * 100) - fill_cents
+    pnl_cents: int = delta_cents * 100 * req.contracts
+    pnl_percent: float = (delta_cents / fill_cents * 100) if fill_cents > 0 else 0
 
     exit_time = req.time or datetime.utcnow().isoformat()
     new_remaining = remaining - req.contracts
@@ -326,40 +350,47 @@ async def log_exit(plan_id: str, req: LogExitRequest):
         "type": req.exit_type,
         "followed_plan": req.followed_plan,
         "deviations": req.deviations,
-        "pnl_dollars": round(pnl_dollars, 2),
+        "pnl_dollars": pnl_cents / 100,
         "pnl_percent": round(pnl_percent, 2),
         "remaining_after": new_remaining,
     }
 
-    await db.add_plan_exit(plan_id, exit_data)
-
-    # Calculate new totals
-    existing_exits = plan.get("exits", [])
-    all_pnl = sum(e.get("pnl_dollars", 0) for e in existing_exits) + pnl_dollars
+    # Calculate new totals (total_pnl_dollars is the running sum of prior exits)
+    all_pnl_cents: int = round(plan.get("total_pnl_dollars", 0) * 100) + pnl_cents
 
     # Determine final status
     new_status = "entered"  # still open
     if new_remaining == 0:
         new_status = "stopped_out" if req.exit_type == "stopped_out" else "exited"
 
+    # Denominators for total P&L percent and R realized (0 = not computable)
+    total_entry_cost_cents = fill_cents * 100 * entry.get("contracts", remaining)
+    stop_price = plan.get("stop", {}).get("price")
+    total_risk_cents = (
+        abs(fill_cents - round(stop_price * 100)) * 100 * entry.get("contracts", remaining)  # rough risk estimate
+        if stop_price and fill_cents > 0 else 0
+    )
+
     updates = {
-        "total_pnl_dollars": round(all_pnl, 2),
+        "total_pnl_dollars": all_pnl_cents / 100,
         "status": new_status,
+        "remaining_contracts": new_remaining,
+        **({"total_pnl_percent": round(all_pnl_cents / total_entry_cost_cents * 100, 2)}
+           if total_entry_cost_cents > 0 else {}),
+        **({"r_realized": round(all_pnl_cents / total_risk_cents, 2)} if total_risk_cents > 0 else {}),
     }
 
-    # Calculate total P&L percent and R realized
-    total_entry_cost = fill_price * 100 * entry.get("contracts", remaining)
-    if total_entry_cost > 0:
-        updates["total_pnl_percent"] = round(all_pnl / total_entry_cost * 100, 2)
-
-    stop_price = plan.get("stop", {}).get("price")
-    if stop_price and fill_price > 0:
-        risk_per_contract = abs(fill_price - stop_price) * 100  # rough risk estimate
-        total_risk = risk_per_contract * entry.get("contracts", remaining)
-        if total_risk > 0:
-            updates["r_realized"] = round(all_pnl / total_risk, 2)
-
-    await db.update_plan_v2(plan_id, updates)
+    # Push the exit and apply the totals in one write, only if no other exit
+    # landed since the plan was read (the totals above build on `remaining`)
+    updated = await db.conditional_update_plan(
+        plan_id, ["entered"], updates,
+        push={"exits": exit_data},
+        match={"remaining_contracts": remaining},
+    )
+    if not updated:
+        await _raise_not_updated(
+            plan_id, "Cannot exit a plan with status '{status}'", conflict_status="entered"
+        )
 
     return {
         "status": new_status,
@@ -372,19 +403,15 @@ async def log_exit(plan_id: str, req: LogExitRequest):
 @router.post("/plans/{plan_id}/cancel")
 async def cancel_plan(plan_id: str, req: CancelPlanRequest):
     """Cancel a watching plan."""
-    plan = await db.get_plan_v2(plan_id)
-    if not plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    if plan.get("status") != "watching":
-        raise HTTPException(status_code=400, detail="Only watching plans can be cancelled")
-
-    await db.update_plan_v2(plan_id, {
+    updated = await db.conditional_update_plan(plan_id, ["watching"], {
         "status": "cancelled",
         "cancellation": {
             "reason": req.reason,
             "time": datetime.utcnow().isoformat(),
         }
     })
+    if not updated:
+        await _raise_not_updated(plan_id, "Only watching plans can be cancelled")
 
     return {"status": "cancelled", "reason": req.reason}
 
@@ -402,7 +429,7 @@ async def get_settings():
 @router.put("/settings")
 async def update_settings(req: UpdateSettingsRequest):
     """Update user settings."""
-    updates = {k: v for k, v in req.dict().items() if v is not None}
+    updates = req.model_dump(exclude_none=True)
     if not updates:
         raise HTTPException(status_code=400, detail="No settings to update")
     await db.update_settings(updates)
@@ -421,7 +448,7 @@ async def get_watchlist():
 
 
 @router.put("/watchlist")
-async def update_watchlist(tickers: list[str]):
+async def update_watchlist(tickers: list[Ticker]):
     """Update saved watchlist."""
     await db.update_watchlist(tickers)
-    return {"tickers": [t.upper() for t in tickers]}
+    return {"tickers": tickers}
@@ -0,0 +1,14 @@
+from app.parsers.csv_parser import parse_tradingview
+
+
+def test_tradingview_non_numeric_cell_drops_row_keeps_prices():
+    csv = (
+        "time,open,high,low,close,Volume\n"
+        "2024-01-02,100,101.5,99.5,100.25,1000\n"
+        "2024-01-03,101,102.75,100.5,-,1200\n"
+        "2024-01-04,102,103.5,101.25,102.5,1500\n"
+    )
+    data = parse_tradingview(csv, "spy")
+
+    assert [b.close for b in data.bars] == [100.25, 102.5]
+    assert [b.low for b in data.bars] == [99.5, 101.25]